@@ -0,0 +1,328 @@
+import numpy as np
+import mysql.connector
+import platform
+import argparse
+import contextlib
+import sqlite3
+import tempfile
+import time
+import json
+import io
+import gc
+import os
+import sys
+from pathlib import Path
+from omegaconf import OmegaConf
+import t2g
+
+# Synthetic tables with the columns used by the conf/ queries, (column name, sql type)
+TABLE_SCHEMAS = {
+    "occurrences": [("occurrence_no", "INTEGER PRIMARY KEY"), ("collection_no", "INTEGER"), ("taxon_no", "INTEGER")],
+    "collections": [("collection_no", "INTEGER PRIMARY KEY"), ("country", "VARCHAR(255)"),
+        ("state", "VARCHAR(255)"), ("county", "VARCHAR(255)"), ("formation", "VARCHAR(255)"),
+        ("geological_group", "VARCHAR(255)"), ("member", "VARCHAR(255)"), ("lithology1", "VARCHAR(255)"),
+        ("lithology2", "VARCHAR(255)"), ("environment", "VARCHAR(255)"), ("max_interval_no", "INTEGER")],
+    "interval_data": [("interval_no", "INTEGER PRIMARY KEY"), ("interval_name", "VARCHAR(255)")],
+}
+
+# Values dropped by the cleaning (see t2g.INVALID_ENTRY_LIST), with the spellings found in PBDB
+INVALID_TEXT_VALUES = ["not reported", "Not Reported", "0", "", " ", None, "None", "NONE"]
+STAGES = ["parsing", "validation", "entity mapping", "edge extraction", "output"]
+LOAD_CHUNK_ROWS = 10000
+
+def skewed_choice(rng, num_values, size, skew=1.1):
+    """
+    Draws size values in 1..num_values with a (bounded) zipf distribution, a few values being very common &
+    most of them rare like in PBDB. The popular values are spread over the range rather than being the
+    smallest ones
+    """
+    weights = 1.0 / np.arange(1, num_values + 1) ** skew
+    ranks = rng.choice(num_values, size=size, p=weights / weights.sum())
+    return rng.permutation(num_values)[ranks] + 1
+
+def text_column(rng, prefix, num_values, size, dirty_fraction):
+    """
+    Generates a skewed text column: 'prefix <n>' values, some spelled with other cases, spaces, quotes or dots
+    (cleaned back to the same token by t2g.clean_token) and some invalid (see INVALID_TEXT_VALUES)
+    """
+    values = np.char.add(prefix + ' ', skewed_choice(rng, num_values, size).astype(str)).astype(object)
+    style = np.where(rng.random(size) < dirty_fraction, rng.integers(0, 4, size), -1)
+    values[style == 0] = [value.upper() for value in values[style == 0]]
+    values[style == 1] = [' ' + value + ' ' for value in values[style == 1]]
+    values[style == 2] = ['"' + value + '"' for value in values[style == 2]]
+    values[style == 3] = [value.title() + '.' for value in values[style == 3]]
+    invalid = rng.random(size) < dirty_fraction
+    values[invalid] = rng.choice(np.array(INVALID_TEXT_VALUES, dtype=object), int(invalid.sum()))
+    return values
+
+def int_column(rng, num_values, size, dirty_fraction, skew=1.1):
+    """
+    Generates a skewed integer column (as python ints), with 0 & NULL invalid values
+    """
+    values = skewed_choice(rng, num_values, size, skew).astype(object)
+    invalid = rng.random(size) < dirty_fraction
+    values[invalid] = rng.choice(np.array([0, None], dtype=object), int(invalid.sum()))
+    return values
+
+def generate_pbdb(scale=1.0, seed=0, dirty_fraction=0.1):
+    """
+    Generates PBDB shaped occurrences, collections & interval_data tables. The same scale, seed &
+    dirty_fraction always give the same tables
+    :param scale: Scale factor, 1 is 100000 occurrences of 30000 taxa in 20000 collections
+    :param seed: Seed of the random generator
+    :param dirty_fraction: Fraction of the values which are invalid, and of the ones which are oddly spelled
+    :return tables: dict of table name -> list of columns (object arrays in the order of TABLE_SCHEMAS)
+    """
+    rng = np.random.default_rng(seed)
+    num_occurrences = max(1, int(100000 * scale))
+    num_collections = max(1, int(20000 * scale))
+    num_taxa = max(1, int(30000 * scale))
+    num_intervals = 1200
+
+    def scaled(num_values):
+        return max(1, int(num_values * scale))
+
+    collections = [np.arange(1, num_collections + 1).astype(object)]
+    for prefix, num_values in [("country", 250), ("state", 3000), ("county", scaled(15000)),
+        ("formation", scaled(8000)), ("group", scaled(1500)), ("member", scaled(5000)), ("lithology", 60),
+        ("lithology", 60), ("environment", 40)]:
+        collections.append(text_column(rng, prefix, num_values, num_collections, dirty_fraction))
+    # some collections point to intervals which are not in interval_data
+    collections.append(int_column(rng, num_intervals + num_intervals // 20, num_collections, dirty_fraction, 0.8))
+
+    occurrences = [np.arange(1, num_occurrences + 1).astype(object),
+        skewed_choice(rng, num_collections, num_occurrences, 0.9).astype(object),
+        int_column(rng, num_taxa, num_occurrences, dirty_fraction)]
+    interval_data = [np.arange(1, num_intervals + 1).astype(object),
+        np.char.add("interval ", np.arange(1, num_intervals + 1).astype(str)).astype(object)]
+    return {"occurrences": occurrences, "collections": collections, "interval_data": interval_data}
+
+def load_tables(db_server, db_name, tables, options=t2g.DEFAULT_OPTIONS):
+    """
+    (Re)creates the tables in the database & inserts their rows, LOAD_CHUNK_ROWS at a time
+    :param db_server: sqlite (db_name is the path of the database file, created if needed) or maria-db/mysql
+        (the database must exist, the db_* credentials of the options are used)
+    """
+    if (db_server == 'sqlite'):
+        cnx = sqlite3.connect(db_name)
+        placeholder = '?'
+    elif (db_server in ('maria-db', 'mysql')):
+        cnx = mysql.connector.connect(**t2g.db_connection_args(db_name, options))
+        placeholder = '%s'
+    else:
+        print("Error: the benchmark database should be sqlite, maria-db or mysql")
+        exit(1)
+
+    cursor = cnx.cursor()
+    for table, columns in tables.items():
+        schema = TABLE_SCHEMAS[table]
+        cursor.execute("DROP TABLE IF EXISTS " + table)
+        cursor.execute("CREATE TABLE " + table + " (" + ', '.join(name + ' ' + sql_type
+            for name, sql_type in schema) + ")")
+        insert = "INSERT INTO " + table + " VALUES (" + ', '.join([placeholder] * len(schema)) + ")"
+        for start in range(0, len(columns[0]), LOAD_CHUNK_ROWS):
+            cursor.executemany(insert, list(zip(*(column[start:start + LOAD_CHUNK_ROWS] for column in columns))))
+    cnx.commit()
+    cnx.close()
+
+def count_rows(query_results, counter):
+    """
+    Passes the (query index, batch) pairs through, adding the number of rows of the batches to counter[0]
+    """
+    for i, result in query_results:
+        counter[0] += len(result)
+        yield i, result
+
+def run_pipeline(config_path, db_server, db_name, overrides, output_path, verbose=False):
+    """
+    Runs the conversion like t2g.main does, stage by stage, measuring the time, number of items & peak memory
+    of every stage. The edge extraction (queries & cleaning) is separated from the output (id mapping & writing)
+    by materializing the cleaned edge batches in between
+    :param overrides: Options replacing the ones of the config file
+    :param output_path: Directory the output files are written to
+    :return stages: dict of stage name -> {"seconds", "items", "items_per_second", "peak_rss_mb"}
+    """
+    sampler = t2g.MemorySampler()
+    sampler.reset()
+    sampler.start()
+    stages = dict()
+    log = sys.stdout if (verbose) else io.StringIO()
+
+    @contextlib.contextmanager
+    def stage(name, counter):
+        sampler.reset()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(log):
+            yield
+        seconds = time.perf_counter() - start
+        stages[name] = {"seconds": seconds, "items": counter[0],
+            "items_per_second": counter[0] / seconds if (seconds > 0) else None,
+            "peak_rss_mb": max(sampler.peak, t2g.current_rss()) / (1 << 20)}
+
+    num_queries = [0]
+    with stage("parsing", num_queries):
+        ret_data = t2g.config_parser_fn(config_path)
+        num_queries[0] = len(ret_data[2]) + len(ret_data[3]) + len(ret_data[5])
+    entity_queries_list = ret_data[2]
+    edge_entity_entity_queries_list = ret_data[3]
+    edge_entity_entity_rel_list = ret_data[4]
+    edge_entity_feature_val_queries_list = ret_data[5]
+    edge_entity_feature_val_rel_list = ret_data[6]
+    options = dict(ret_data[7])
+    options.update(overrides)
+    for name in ("cache_dir", "id_store_dir", "spill_dir"):
+        if (options[name] is not None):
+            print(f'Error: {name} depends on the earlier runs and is not supported by the benchmark')
+            exit(1)
+
+    with stage("validation", num_queries):
+        entity_queries_list = t2g.validation_check_entity_queries(entity_queries_list)
+        edge_entity_entity_queries_list = t2g.validation_check_edge_entity_entity_queries(
+            edge_entity_entity_queries_list)
+        edge_entity_feature_val_queries_list = t2g.validation_check_edge_entity_feature_val_queries(
+            edge_entity_feature_val_queries_list)
+
+    cnx, cursor = t2g.connect_to_db(db_server, db_name, None, options)
+    executor = t2g.create_query_executor(db_server, db_name, options["num_workers"], options["worker_type"], options)
+    num_entity_rows = [0]
+    with stage("entity mapping", num_entity_rows):
+        entity_units = t2g.single_query_units(entity_queries_list)
+        if (options["pushdown_cleaning"]):
+            entity_units = [t2g.pushdown_cleaning_unit(unit, db_server, cursor) for unit in entity_units]
+        entity_results = t2g.execute_query_units(cursor, entity_units, options, executor)
+        entity_mapping = t2g.entity_node_to_uuids(count_rows(entity_results, num_entity_rows), entity_queries_list)
+
+    num_edge_rows = [0]
+    with stage("edge extraction", num_edge_rows):
+        edge_queries_list = edge_entity_entity_queries_list + edge_entity_feature_val_queries_list
+        edge_units = t2g.plan_shared_scans(edge_queries_list) if (options["shared_scans"]) \
+            else t2g.single_query_units(edge_queries_list)
+        if (options["pushdown_cleaning"]):
+            edge_units = [t2g.pushdown_cleaning_unit(unit, db_server, cursor) for unit in edge_units]
+        edge_results = list(count_rows(t2g.execute_query_units(cursor, edge_units, options, executor), num_edge_rows))
+
+    num_edges = [0]
+    with stage("output", num_edges):
+        t2g.output_dir = Path(output_path)
+        t2g.post_processing(edge_results, edge_entity_entity_queries_list, edge_entity_entity_rel_list,
+            edge_entity_feature_val_queries_list, edge_entity_feature_val_rel_list, entity_mapping, options)
+        num_edges[0] = num_edge_rows[0]
+
+    if (executor is not None):
+        executor.shutdown()
+    sampler.stop()
+    return stages
+
+def best_stages(runs):
+    """
+    Keeps the fastest time of every stage over the repeated runs (the least disturbed by the rest of the
+    machine) & the largest peak memory
+    """
+    stages = dict()
+    for name in STAGES:
+        fastest = min((run[name] for run in runs), key=lambda stage: stage["seconds"])
+        stages[name] = dict(fastest, peak_rss_mb=max(run[name]["peak_rss_mb"] for run in runs))
+    return stages
+
+def environment_info():
+    """
+    Returns the versions & machine the benchmark ran on, stored with the results
+    """
+    info = {"python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count(),
+        "numpy": np.__version__, "pandas": t2g.pd.__version__}
+    info["pyarrow"] = t2g.pa.__version__ if (t2g.pa is not None) else None
+    return info
+
+def compare_to_baseline(results, baseline, tolerance=0.2, min_seconds=0.05):
+    """
+    Prints the time & peak memory of every stage relative to the baseline
+    :param tolerance: Relative slow down (or memory growth) above which a stage is a regression
+    :param min_seconds: Stages faster than this in the baseline are too noisy to be checked for time
+    :return regressions: List of the regressed stages
+    """
+    if (baseline["benchmark"]["scale"] != results["benchmark"]["scale"]
+        or baseline["benchmark"]["seed"] != results["benchmark"]["seed"]):
+        print("Warning: the baseline was measured on another dataset (scale or seed)")
+    regressions = list()
+    print(f'{"stage":<16}{"seconds":>10}{"baseline":>10}{"ratio":>8}{"peak MB":>10}{"baseline":>10}')
+    for name in STAGES:
+        current = results["stages"][name]
+        previous = baseline["stages"][name]
+        time_ratio = current["seconds"] / previous["seconds"] if (previous["seconds"] > 0) else 1.0
+        memory_ratio = current["peak_rss_mb"] / previous["peak_rss_mb"] if (previous["peak_rss_mb"] > 0) else 1.0
+        regressed = (previous["seconds"] >= min_seconds and time_ratio > 1 + tolerance) \
+            or memory_ratio > 1 + tolerance
+        if (regressed):
+            regressions.append(name)
+        print(f'{name:<16}{current["seconds"]:>10.3f}{previous["seconds"]:>10.3f}{time_ratio:>8.2f}'
+            f'{current["peak_rss_mb"]:>10.1f}{previous["peak_rss_mb"]:>10.1f}' + ("  REGRESSION" if (regressed) else ''))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks t2g on a synthetic PBDB shaped database")
+    parser.add_argument("--config", default="conf/config.yaml", help="config file with the queries to run")
+    parser.add_argument("--scale", type=float, default=1.0, help="scale factor, 1 is 100000 occurrences")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dirty-fraction", type=float, default=0.1, help="fraction of invalid/oddly spelled values")
+    parser.add_argument("--db-server", default="sqlite", help="sqlite, maria-db or mysql")
+    parser.add_argument("--db-name", default=None, help="sqlite file or database name (default: sqlite file "
+        "in the temporary directory, named after the scale & seed)")
+    parser.add_argument("--regenerate", action="store_true", help="regenerate the sqlite file even if it exists")
+    parser.add_argument("--set", nargs='*', default=[], metavar="KEY=VALUE", help="options overriding the config")
+    parser.add_argument("--repeat", type=int, default=3, help="runs to keep the fastest of")
+    parser.add_argument("--output", default="benchmark_results.json", help="json file the results are written to")
+    parser.add_argument("--baseline", default=None, help="json results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--verbose", action="store_true", help="show the output of t2g")
+    args = parser.parse_args()
+
+    overrides = OmegaConf.to_container(OmegaConf.from_dotlist(args.set))
+    unknown = [name for name in overrides if (name not in t2g.DEFAULT_OPTIONS)]
+    if (len(unknown) != 0):
+        print(f'Error: unknown options {unknown}')
+        exit(1)
+
+    db_name = args.db_name
+    if (db_name is None and args.db_server == 'sqlite'):
+        db_name = str(Path(tempfile.gettempdir()) / Path(f't2g_benchmark_s{args.scale:g}_seed{args.seed}'
+            f'_d{args.dirty_fraction:g}.sqlite'))
+    dataset = {"generation_seconds": None}
+    if (args.db_server != 'sqlite' or args.regenerate or not Path(db_name).exists()):
+        start = time.perf_counter()
+        tables = generate_pbdb(args.scale, args.seed, args.dirty_fraction)
+        load_tables(args.db_server, db_name, tables, dict(t2g.DEFAULT_OPTIONS, **overrides))
+        dataset["generation_seconds"] = time.perf_counter() - start
+        print(f'Generated {", ".join(f"{len(columns[0])} {table}" for table, columns in tables.items())} '
+            f'in {dataset["generation_seconds"]:.1f}s')
+        del tables  # not to be counted in the peak memory of the stages
+        gc.collect()
+
+    runs = list()
+    for r in range(args.repeat):
+        with tempfile.TemporaryDirectory() as output_path:
+            runs.append(run_pipeline(args.config, args.db_server, db_name, overrides, output_path, args.verbose))
+        print(f'Run {r + 1}/{args.repeat}: ' + ', '.join(f'{name} {stage["seconds"]:.3f}s'
+            for name, stage in runs[-1].items()))
+
+    results = {
+        "benchmark": {"scale": args.scale, "seed": args.seed, "dirty_fraction": args.dirty_fraction,
+            "db_server": args.db_server, "config": args.config, "options": overrides, "repeat": args.repeat},
+        "environment": environment_info(),
+        "dataset": dataset,
+        "stages": best_stages(runs),
+    }
+    results["total_seconds"] = sum(stage["seconds"] for stage in results["stages"].values())
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f'Results written to {args.output}')
+
+    if (args.baseline is not None):
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if (len(regressions) != 0):
+            print(f'Error: {len(regressions)} stages regressed compared to {args.baseline}')
+            exit(1)
+
+if __name__ == "__main__":
+    main()
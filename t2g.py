@@ -1,30 +1,122 @@
 import numpy as np
 import pandas as pd
 import mysql.connector
+import mysql.connector.pooling
 from mysql.connector import errorcode
+from mysql.connector.constants import FieldType
 import threading
+import queue
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from pathlib import Path
-import uuid
 import re
+import os
+import json
+import pickle
+import hashlib
+import tempfile
+import uuid
+import argparse
+import time
+import sys
+import contextlib
+import atexit
+import sqlite3
+from urllib.parse import quote
 import hydra
 from omegaconf import DictConfig, OmegaConf
 from pathlib import Path
 
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None  # only needed for cleaning_engine: arrow, python is used otherwise
+
+# optional database drivers (see connect_to_db), the ADBC ones return the results as arrow record batches
+try:
+    import adbc_driver_sqlite.dbapi as adbc_sqlite
+except ImportError:
+    adbc_sqlite = None  # sqlite3 is used otherwise
+try:
+    import adbc_driver_postgresql.dbapi as adbc_postgresql
+except ImportError:
+    adbc_postgresql = None  # psycopg is used otherwise
+try:
+    import psycopg
+except ImportError:
+    psycopg = None
+
 INVALID_ENTRY_LIST = ["0", None, "", 0, "not reported", "None", "none"]
 output_dir = Path("./")
 
+# Optional settings of the yaml config file & their default values
+DEFAULT_OPTIONS = {
+    "batch_size": None,  # rows fetched per fetchmany() call, None materializes every query result at once
+    "num_workers": 1,  # queries executed concurrently, each worker has its own database connection
+    "worker_type": "threads",  # threads (sharing a connection pool) or processes
+    "shared_scans": True,  # run the edge queries with the same FROM/WHERE clause as a single scan
+    "pushdown_cleaning": False,  # trim, lower case, filter invalid values & deduplicate in sql (see pushdown_cleaning)
+    "cleaning_engine": "arrow" if (pa is not None) else "python",  # see clean_column, arrow needs pyarrow
+    "cleaning_workers": 1,  # processes sharing the cleaning of results with at least PARALLEL_CLEANING_MIN_ROWS rows
+    "output_format": "text",  # text (all_edges(t2g).txt) or binary (preprocessed Marius files, see BinaryEdgeWriter)
+    "id_dtype": "int32",  # int32 or int64 ids in the binary output
+    "num_partitions": None,  # node partitions to bucket the binary edges by, None for no partitioning
+    "cache_dir": None,  # directory of the query result cache (see query_cache_key), None disables the cache
+    "cache_fingerprint": "update_time",  # update_time, checksum or row_count (see table_fingerprints)
+    "checkpoint_dir": None,  # directory the completed queries of the run are checkpointed to (see start_checkpoint)
+    "id_store_dir": None,  # directory keeping the node & relation ids stable across runs (see load_id_store)
+    "delta_edges": False,  # with an id_store_dir, also write the edges new since the last run to delta_edges(t2g).txt
+    "spill_dir": None,  # directory of the spill files of the out-of-core mode (see external_post_processing)
+    "spill_partitions": 64,  # number of hash partitions of the nodes & edges in the out-of-core mode
+    "memory_budget_mb": 1024,  # memory a partition & the spill buffers should fit in, in the out-of-core mode
+    "db_user": "root",  # credentials of the maria-db/mysql & postgres servers (see db_connection_args)
+    "db_password": "",
+    "db_host": "127.0.0.1",
+    "db_port": None,  # None for the default port of the server
+    "sqlite_driver": "sqlite3",  # sqlite3, or adbc for arrow batches (one type per column, see connect_to_db)
+    "report_path": None,  # run report with the time, rows & memory of every stage & query (.json or .csv)
+    "progress": False,  # show a live progress line on stderr
+    "preflight": False,  # EXPLAIN every query & print them ranked by cost before running them (see preflight_queries)
+    "temporary_indexes": False,  # index the join keys without an index for the duration of the run (needs preflight)
+    "sample_column": None,  # entity column to sample the graph from, e.g. occurrences.taxon_no (see sample_graph)
+    "sample_fraction": 0.01,  # fraction of the values of the sample_column kept by the hash sample
+    "sample_seed": 0,  # seed of the hash sample, the same seed always gives the same sample
+    "sample_values": None,  # list of values of the sample_column to sample from instead of a hash sample
+    "node_features": None,  # dict of entity to feature value relation -> multi_hot, float32 or bucketized, written
+                            # as node feature matrices instead of edges (see write_node_features)
+    "feature_buckets": 16,  # number of ranges of the bucketized node features
+    "split_fractions": None,  # [train, validation, test] fractions of the edges, None writes all of them to one file
+    "split_seed": 0,  # seed of the split assignment & of the shuffling (see SplitEdgeWriter)
+    "split_stratified": False,  # split the edges of every relation in the split_fractions
+    "shuffle_buffer_edges": 1 << 22,  # edges of a split shuffled together before being written, 0 keeps their order
+}
+
+# Characters removed by python's str.strip() (str.isspace), for the kernels which need them spelled out
+PY_WHITESPACE = '\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f \x85\xa0\u1680\u2000\u2001\u2002\u2003\u2004\u2005\u2006' \
+    '\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000'
+PARALLEL_CLEANING_MIN_ROWS = 100000
+EDGE_CHUNK_ROWS = 1 << 20  # edges per chunk when re-reading memory-mapped edge files
+MEMORY_SAMPLING_SECONDS = 0.005
+PROGRESS_SECONDS = 0.5
+UNIT_QUEUE_BATCHES = 2  # batches a worker can produce ahead of the consumption of its unit (see QueryExecutor)
+SPLIT_NAMES = ["train", "validation", "test"]
+SAMPLE_PUSHDOWN_MAX_VALUES = 10000  # larger samples of a column are only filtered on the client side
+
 def config_parser_fn(config_name):
     """
     Takes the input yaml config file's name (& relative path). Returns all the extracted data
     :param config_name: file name (& relative path) for the YAML config file
     :returns:
-        - db_server: string denoting database server (initial support only for mariadb)
+        - db_server: string denoting database server (maria-db, mysql, postgres or sqlite, see connect_to_db)
         - db_name: name of the database you need to pull from
         - entity_node_sql_queries: list of sql queries used to define entity nodes
         - edge_entity_entity_sql_queries: list of sql queries to define edges of type entity nodes to entity nodes 
             & the names of edges
         - edge_entity_feature_values_sql_queries: list of sql queries to define edges of type entity node to feature 
             values & also the names of edges
+        - options: dict with the optional settings (see DEFAULT_OPTIONS), defaults are used for missing keys
     """
     input_cfg = None
     input_config_path = Path(config_name).absolute()
@@ -113,24 +205,63 @@ def config_parser_fn(config_name):
         print("ERROR: edges_entity_feature_values_queries is not defined")
         exit(1)
 
-    return db_server, db_name, entity_node_sql_queries, edge_entity_entity_sql_queries, edge_entity_entity_rel_list, edge_entity_feature_values_sql_queries, edge_entity_feature_values_rel_list
+    # Optional settings
+    options = dict(DEFAULT_OPTIONS)
+    for key in DEFAULT_OPTIONS.keys():
+        if key in input_cfg.keys():
+            value = input_cfg[key]
+            if (OmegaConf.is_config(value)):
+                value = OmegaConf.to_container(value, resolve=True)
+            options[key] = value
+
+    return db_server, db_name, entity_node_sql_queries, edge_entity_entity_sql_queries, edge_entity_entity_rel_list, edge_entity_feature_values_sql_queries, edge_entity_feature_values_rel_list, options
 
-def connect_to_db(db_server, db_name):
+def db_connection_args(db_name, options=DEFAULT_OPTIONS):
+    """
+    Returns the arguments used to connect to the maria-db/mysql server, by single connections & connection pools
+    The credentials are the db_user, db_password, db_host & db_port of the config file (root, "" & 127.0.0.1
+    by default)
+    """
+    args = {"user": options["db_user"],
+            "password": options["db_password"],
+            "host": options["db_host"],
+            "database": db_name}
+    if (options["db_port"] is not None):
+        args["port"] = options["db_port"]
+    return args
+
+def postgres_uri(db_name, options=DEFAULT_OPTIONS):
+    """
+    Returns the postgresql:// uri of the database, with the credentials of the config file
+    """
+    port = ':' + str(options["db_port"]) if (options["db_port"] is not None) else ''
+    return 'postgresql://' + quote(options["db_user"], safe='') + ':' + quote(options["db_password"], safe='') \
+        + '@' + options["db_host"] + port + '/' + quote(db_name, safe='')
+
+def connect_to_db(db_server, db_name, pool=None, options=DEFAULT_OPTIONS):
     """
     Function takes db_server and db_name as the input. Tries to connect to the database and returns an object
     which can be used to execute queries.
-    Assumption: default user: root, host: 127.0.0.1 and password:"". You will need to change code if otherwise
-    :param db_server: The name of the backend database application used for accessing data
-    :param db_name: The name of the database where the data resides
-    :return cursor: Object that can be used to execute the database queries
+    :param db_server: The name of the backend database application used for accessing data: maria-db or mysql
+        (mysql.connector), postgres (ADBC driver if installed, else psycopg) or sqlite (sqlite3, or the ADBC
+        driver with sqlite_driver: adbc). The sqlite ADBC driver infers the type of a column from its first rows:
+        a later value of another type fails the query and REAL values of text columns are rendered as e.g.
+        3.500000e+00, so it is only used when asked for
+    :param db_name: The name of the database where the data resides, the path of the database file for sqlite
+    :param pool: Optional connection pool (see create_connection_pool) to take the connection from
+    :param options: Optional settings (see DEFAULT_OPTIONS), the db_* credentials are used
+    :return cursor: DB-API cursor that can be used to execute the database queries. The cursors of the ADBC
+        drivers also return the results as arrow record batches (see fetch_query_batches)
     """
-    if db_server == 'maria-db':
+    cnx = None
+    cursor = None
+    if db_server in ('maria-db', 'mysql'):
         try:
-            cnx = mysql.connector.connect(user='root',
-                                        password='123456@Sun',  # change password to your own
-                                        host='127.0.0.1',
-                                        database=db_name)
-            cursor = cnx.cursor()
+            if (pool is None):
+                cnx = mysql.connector.connect(**db_connection_args(db_name, options))
+            else:
+                cnx = pool.get_connection()
+            cursor = cnx.cursor(buffered=False)  # unbuffered, rows are only pulled by fetchall/fetchmany
         except mysql.connector.Error as err:
             if err.errno == errorcode.ER_ACCESS_DENIED_ERROR:
                 print("Incorrect user name or password")
@@ -138,11 +269,57 @@ def connect_to_db(db_server, db_name):
                 print("Non-existing database")
             else:
                 print(err)
+    elif db_server == 'postgres':
+        if (adbc_postgresql is not None):
+            cnx = adbc_postgresql.connect(postgres_uri(db_name, options))
+            cursor = cnx.cursor()
+        elif (psycopg is not None):
+            cnx = psycopg.connect(postgres_uri(db_name, options))
+            cursor = cnx.cursor(name="t2g")  # server side, rows are only pulled by fetchall/fetchmany
+        else:
+            print("Error: db_server postgres needs the adbc-driver-postgresql or psycopg package")
+            exit(1)
+    elif db_server == 'sqlite':
+        if (not Path(db_name).exists()):
+            print("Non-existing database")
+            exit(1)
+        if (options["sqlite_driver"] == "adbc"):
+            if (adbc_sqlite is None):
+                print("Error: sqlite_driver adbc needs the adbc-driver-sqlite package")
+                exit(1)
+            cnx = adbc_sqlite.connect(db_name)
+        elif (options["sqlite_driver"] == "sqlite3"):
+            cnx = sqlite3.connect(db_name)
+        else:
+            print("Error: sqlite_driver should be sqlite3 or adbc")
+            exit(1)
+        cursor = cnx.cursor()
     else:
-        print('Other databases are currently not supported.')
-    
+        print('Error: db_server should be maria-db, mysql, postgres or sqlite')
+        exit(1)
+
     return cnx, cursor
 
+def command_cursor(cnx, cursor):
+    """
+    Returns a cursor of the connection which can run EXPLAIN & DDL statements: the server side cursor of psycopg
+    (see connect_to_db) can only run a SELECT, so a client side cursor is opened for them
+    """
+    if (psycopg is not None and isinstance(cursor, psycopg.ServerCursor)):
+        return cnx.cursor()
+    return cursor
+
+def create_connection_pool(db_server, db_name, pool_size, options=DEFAULT_OPTIONS):
+    """
+    Creates a pool of pool_size database connections which can be shared by worker threads
+    :return pool: The connection pool, None for the servers whose driver has no pool (every worker then
+        opens its own connection)
+    """
+    if db_server in ('maria-db', 'mysql'):
+        return mysql.connector.pooling.MySQLConnectionPool(pool_name="t2g", pool_size=pool_size,
+                                                           **db_connection_args(db_name, options))
+    return None
+
 # Validation check code
 def validation_check_entity_queries(entity_query_list):
     """
@@ -259,66 +436,2020 @@ def validation_check_edge_entity_feature_val_queries(edge_entity_feature_val_que
     
     return new_query_list
 
+def split_select_query(query):
+    """
+    Splits a plain 'SELECT [DISTINCT] expr1, expr2, ... FROM ____ WHERE ____;' query into its parts
+    :param query: sql query
+    :return (distinct, select_list, from_where): distinct is True for SELECT DISTINCT, select_list is the list
+        of projected expressions & from_where the text after the first FROM (without the final ';').
+        None if the query does not have this format
+    """
+    match = re.match(r'^\s*select\s+(distinct\s+)?(.*?)\s+from\s+(.*?)\s*;?\s*$', query, re.IGNORECASE | re.DOTALL)
+    if (match is None):
+        return None
+
+    # splitting the projected expressions on the commas which are not inside parentheses
+    select_list = list()
+    depth = 0
+    expr = ''
+    for c in match.group(2):
+        if (c == ',' and depth == 0):
+            select_list.append(expr.strip())
+            expr = ''
+            continue
+        depth = depth + (c == '(') - (c == ')')
+        expr = expr + c
+    select_list.append(expr.strip())
+
+    return match.group(1) is not None, select_list, match.group(3)
+
+def split_union_query(query):
+    """
+    Splits a query on its UNION [ALL] operators
+    :return parts: List of the sub-queries (a single element if there is no UNION)
+    """
+    return re.split(r'\s+union(?:\s+all)?\s+', query.strip().rstrip(';'), flags=re.IGNORECASE)
+
+def is_plain_select_query(query, num_columns):
+    """
+    Checks if the rows of a (UNION free) query come straight from its FROM/WHERE clause: it projects num_columns
+    plain columns and has no aggregation, sub-query or limit
+    """
+    parsed = split_select_query(query)
+    if (parsed is None):
+        return False
+    distinct, select_list, from_where = parsed
+    if (len(select_list) != num_columns or any(('(' in expr or expr == '' or expr == '*') for expr in select_list)):
+        return False
+    return re.search(r'\b(intersect|except|group|having|order|limit|select)\b|\(', from_where,
+        re.IGNORECASE) is None
+
+def is_shareable_query(query):
+    """
+    Checks if the rows of the query come straight from its FROM/WHERE clause, i.e. the query could be answered
+    by projecting the columns of a wider scan over the same FROM/WHERE clause
+    Note: the parts of a UNION are shareable if they all have the same FROM/WHERE clause, since the duplicates
+    removed by the UNION are removed on the client side anyway
+    """
+    keys = set()
+    for part in split_union_query(query):
+        if (not is_plain_select_query(part, 2) or split_select_query(part)[0]):
+            return False
+        keys.add(' '.join(split_select_query(part)[2].split()))
+    return len(keys) == 1
+
+def plan_shared_scans(queries_list):
+    """
+    Groups the queries with identical FROM/WHERE clauses so each group runs as one multi column scan, which is
+    then fanned out into the individual queries on the client side (see run_query_unit)
+    :param queries_list: List of (validated) edge queries
+    :return units: List of (members, query) to execute, members being the list of (query index, projections)
+        of the queries answered by the unit. projections is the list of column positions of the (src, dst)
+        pairs in the scan (one per part of a UNION), None for a query run on its own
+    """
+    units = list()
+    groups = dict()  # normalized FROM/WHERE clause -> (position in units, projected columns, members)
+    for i in range(len(queries_list)):
+        query = queries_list[i]
+        if (not is_shareable_query(query)):
+            units.append(([(i, None)], query))
+            continue
+
+        projections = list()
+        for part in split_union_query(query):
+            distinct, select_list, from_where = split_select_query(part)
+            key = ' '.join(from_where.split())
+            if (key not in groups):
+                groups[key] = (len(units), list(), list())
+                units.append(None)
+            position, columns, members = groups[key]
+            for expr in select_list:
+                if (expr not in columns):
+                    columns.append(expr)
+            projections.append(tuple(columns.index(expr) for expr in select_list))
+        members.append((i, projections))
+
+    for key, (position, columns, members) in groups.items():
+        if (len(members) == 1 and len(members[0][1]) == 1):
+            units[position] = ([(members[0][0], None)], queries_list[members[0][0]])
+        else:
+            units[position] = (members, "SELECT " + ', '.join(columns) + " FROM " + key + ";")
+
+    print(f'Shared scans: {len(queries_list)} edge queries planned as {len(units)} scans')
+    return units
+
+# Column types cleaned by pushdown_cleaning on the database, as reported by the cursor descriptions: the
+# database & python only render the values of text & integer columns the same way (e.g. mysql & postgres
+# render a DOUBLE 1.0 as 1, python as 1.0)
+PUSHDOWN_MYSQL_TYPES = {FieldType.TINY, FieldType.SHORT, FieldType.INT24, FieldType.LONG, FieldType.LONGLONG,
+    FieldType.VARCHAR, FieldType.VAR_STRING, FieldType.STRING, FieldType.TINY_BLOB, FieldType.BLOB,
+    FieldType.MEDIUM_BLOB, FieldType.LONG_BLOB}
+MYSQL_BINARY_CHARSET = 63  # the BLOB types of the columns without a character set
+PUSHDOWN_POSTGRES_TYPES = {20, 21, 23, 25, 1042, 1043}  # oids of int8, int2, int4, text, bpchar & varchar
+
+def pushdown_column_expr(expr, db_server):
+    """
+    Returns the sql expression doing the cheap part of clean_token (trimming spaces & lower casing) on the
+    database. For maria-db/mysql the result is compared with a binary collation, so DISTINCT & NOT IN do not merge
+    values which are only equal under a case or accent insensitive collation. postgres has no LOWER for
+    numbers, so the column is cast to text first. sqlite columns can hold values of any type, so only the text
+    & integer values are rewritten, the others (e.g. REAL, which sqlite renders as 1.0e+20 where python has
+    1e+20) are returned as they are & never equal the text values of INVALID_ENTRY_LIST
+    """
+    if (db_server in ('maria-db', 'mysql')):
+        return 'CAST(LOWER(TRIM(' + expr + ')) AS CHAR CHARACTER SET utf8mb4) COLLATE utf8mb4_bin'
+    elif (db_server == 'postgres'):
+        return 'LOWER(TRIM(CAST(' + expr + ' AS TEXT)))'
+    return "CASE WHEN typeof(" + expr + ") IN ('integer', 'text') THEN LOWER(TRIM(" + expr + ")) ELSE " + expr + " END"
+
+def pushdown_column_types(cursor, part, db_server):
+    """
+    Checks which columns of a plain select (see is_plain_select_query) can be cleaned on the database, from
+    the column types of its cursor description (the query is run with LIMIT 0)
+    :param cursor: Cursor of the database connection, None when no connection is available
+    :return cleanable: List of bools, one per projected column. All the columns of sqlite are cleanable, the
+        type being checked value by value (see pushdown_column_expr), and none of the other servers without
+        a cursor
+    """
+    num_columns = len(split_select_query(part)[1])
+    if (db_server == 'sqlite'):
+        return [True] * num_columns
+    if (cursor is None):
+        return [False] * num_columns
+    cursor.execute(part.strip().rstrip(';') + ' LIMIT 0')
+    description = cursor.description
+    cursor.fetchall()
+    cleanable = list()
+    for column in description:
+        type_code = column[1]
+        if (pa is not None and isinstance(type_code, pa.DataType)):  # ADBC drivers report arrow types
+            cleanable.append(pa.types.is_integer(type_code) or pa.types.is_string(type_code)
+                or pa.types.is_large_string(type_code))
+        elif (db_server in ('maria-db', 'mysql')):
+            cleanable.append(type_code in PUSHDOWN_MYSQL_TYPES and column[8] != MYSQL_BINARY_CHARSET)
+        else:
+            cleanable.append(type_code in PUSHDOWN_POSTGRES_TYPES)
+    return cleanable
+
+def pushdown_cleaning(query, db_server, filter_columns=None, cursor=None):
+    """
+    Rewrites a query so the database does the token cleaning & invalid value filtering before the transfer:
+    every projected text or integer column is wrapped in LOWER(TRIM(...)), IS NOT NULL & NOT IN predicates
+    generated from INVALID_ENTRY_LIST are added and the rows are made DISTINCT. The columns of other types
+    (floats, decimals, dates ...) are left as they are with only the IS NOT NULL predicate, see
+    pushdown_column_types. The rows are still cleaned by clean_token afterwards, which gives the same tokens
+    as cleaning the raw values (as long as the database & python agree on lower casing, e.g. ASCII text), so
+    the edge list is unchanged
+    :param query: Query to rewrite, every part of a UNION is rewritten. Queries which are not plain selects
+        (see is_plain_select_query) are returned unchanged
+    :param filter_columns: Positions of the columns to add the predicates for, None for all of them
+    :param cursor: Cursor used to look up the column types on maria-db/mysql & postgres, without it only the
+        IS NOT NULL predicates & the DISTINCT are pushed down
+    :return query: The rewritten query
+    """
+    parts = split_union_query(query)
+    num_columns = len(split_select_query(parts[0])[1]) if (split_select_query(parts[0]) is not None) else 0
+    if (any((not is_plain_select_query(part, num_columns)) for part in parts)):
+        return query
+
+    invalid_values = sorted(set(str(val).lower() for val in INVALID_ENTRY_LIST if val is not None))
+    invalid_values = ', '.join("'" + val.replace("'", "''") + "'" for val in invalid_values)
+
+    new_parts = list()
+    for part in parts:
+        distinct, select_list, from_where = split_select_query(part)
+        cleanable = pushdown_column_types(cursor, part, db_server)
+        exprs = [pushdown_column_expr(select_list[col], db_server) if (cleanable[col]) else select_list[col]
+            for col in range(len(select_list))]
+        predicates = list()
+        for col in range(len(select_list)):
+            if (filter_columns is None or col in filter_columns):
+                predicates.append(select_list[col] + ' IS NOT NULL')
+                if (cleanable[col]):
+                    predicates.append(exprs[col] + ' NOT IN (' + invalid_values + ')')
+
+        if (len(predicates) != 0):
+            from_where = add_where_predicates(from_where, predicates)
+
+        new_parts.append('SELECT DISTINCT ' + ', '.join(exprs) + ' FROM ' + from_where)
+    return ' UNION '.join(new_parts) + ';'
+
+def add_where_predicates(from_where, predicates):
+    """
+    Adds the predicates to the WHERE clause of the FROM/WHERE part of a query (see split_select_query)
+    """
+    where = re.search(r'\bwhere\b', from_where, re.IGNORECASE)
+    if (where is None):
+        return from_where + ' WHERE ' + ' AND '.join(predicates)
+    return from_where[:where.start()] + 'WHERE (' + from_where[where.end():].strip() + ') AND ' \
+        + ' AND '.join(predicates)
+
+def pushdown_cleaning_unit(unit, db_server, cursor=None):
+    """
+    Applies pushdown_cleaning to the query of a unit of work (see plan_shared_scans). The rows of a shared
+    scan are only filtered on the columns used by every one of its queries, the other columns being valid
+    for some of the queries
+    """
+    members, query = unit
+    filter_columns = None
+    for i, projections in members:
+        if (projections is not None):
+            for columns in projections:
+                filter_columns = set(columns) if (filter_columns is None) else filter_columns & set(columns)
+    if (filter_columns is not None and len(members) == 1 and members[0][1] is None):
+        filter_columns = None
+    return members, pushdown_cleaning(query, db_server, filter_columns, cursor)
+
+def single_query_units(queries_list):
+    """
+    Returns one unit of work (see plan_shared_scans) for every query
+    """
+    return [([(i, None)], queries_list[i]) for i in range(len(queries_list))]
+
 def clean_token(token):
     token = str(token)
     token = token.strip().strip("\t.\'\" ")
     return token.lower()
 
-def get_uuid(val):
-    # return uuid.uuid5(uuid.NAMESPACE_DNS, str(val))
-    return val
+def column_to_objects(values):
+    """
+    Returns a column of raw values as an object array of python values, with None for the NULLs, whether
+    it was fetched as python objects or as an arrow column (see fetch_query_batches)
+    """
+    if (isinstance(getattr(values, "dtype", None), pd.ArrowDtype)):
+        objects = np.empty(len(values), dtype=object)
+        objects[:] = pa.array(values.array).to_pylist()
+        return objects
+    return np.asarray(values, dtype=object)
+
+def column_to_arrow_strings(values):
+    """
+    Converts a column of raw values to an arrow string array, each value being converted like str() does.
+    Columns of only strings or only ints (and NULLs) are converted by arrow directly, other columns go
+    through str() value by value. Arrow columns of strings or ints are converted without any python object
+    """
+    if (isinstance(getattr(values, "dtype", None), pd.ArrowDtype)):
+        arrow_values = pa.array(values.array)
+        if (pa.types.is_string(arrow_values.type) or pa.types.is_large_string(arrow_values.type)
+            or pa.types.is_integer(arrow_values.type) or pa.types.is_null(arrow_values.type)):
+            return pc.fill_null(pc.cast(arrow_values, pa.large_string()), "None")
+
+    values = column_to_objects(values)
+    kind = pd.api.types.infer_dtype(values, skipna=True)
+    try:
+        if (kind in ("string", "empty")):
+            return pc.fill_null(pa.array(values, type=pa.large_string()), "None")
+        elif (kind == "integer"):
+            return pc.fill_null(pc.cast(pa.array(values, type=pa.int64()), pa.large_string()), "None")
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        pass  # e.g. NaN floats among the strings, ints not fitting in 64 bits
+    return pa.array(list(map(str, values)), type=pa.large_string())
+
+def clean_column(values, engine="arrow"):
+    """
+    Column at a time version of clean_token. The output is byte-identical to calling clean_token on every value
+    :param values: Series/array of raw values
+    :param engine: arrow (pyarrow compute kernels run on the whole column, lower casing of non ASCII columns
+        is left to python since it differs for a few characters) or python (clean_token on every value)
+    :return tokens: Object array with the cleaned tokens
+    """
+    if (engine == "python"):
+        return pd.Series(column_to_objects(values), dtype=object).map(clean_token).to_numpy()
+
+    tokens = pc.utf8_trim(column_to_arrow_strings(values), characters=PY_WHITESPACE)
+    tokens = pc.utf8_trim(tokens, characters="\t.\'\" ")
+    if (pc.all(pc.string_is_ascii(tokens)).as_py() is not False):
+        return pc.ascii_lower(tokens).to_numpy(zero_copy_only=False)
+    return pd.Series(tokens.to_numpy(zero_copy_only=False), dtype=object).str.lower().to_numpy()
+
+def clean_tokens(result, engine="arrow", num_workers=1):
+    """
+    Strips and lower cases every token of the result (same as result.applymap(clean_token)), column by column
+    :param result: Dataframe with the raw query result
+    :param engine: String kernels to use (see clean_column)
+    :param num_workers: Processes to spread the rows over, only used for results with at least
+        PARALLEL_CLEANING_MIN_ROWS rows
+    :return result: Dataframe with the cleaned tokens, same index & columns
+    """
+    if (num_workers > 1 and len(result) >= PARALLEL_CLEANING_MIN_ROWS):
+        chunks = np.array_split(np.arange(len(result)), num_workers)
+        chunks = [result.iloc[chunk] for chunk in chunks]
+        executor = get_cleaning_executor(num_workers)
+        return pd.concat(list(executor.map(clean_tokens, chunks, [engine] * len(chunks))))
+
+    cleaned = pd.DataFrame(index=result.index)
+    for col in range(result.shape[1]):
+        cleaned[col] = clean_column(result.iloc[:, col], engine)
+    cleaned.columns = result.columns
+    return cleaned
+
+# Process pool shared by all the calls of clean_tokens (see get_cleaning_executor)
+cleaning_executor = None
+
+def get_cleaning_executor(num_workers):
+    global cleaning_executor
+    if (cleaning_executor is None):
+        cleaning_executor = ProcessPoolExecutor(num_workers)
+    return cleaning_executor
+
+def build_id_mapping(values):
+    """
+    Assigns dense integer ids (0, 1, 2, ...) to the given values in order of first appearance
+    :param values: Series/array of names, duplicates are allowed
+    :return mapping: Series indexed by the unique names with their integer id as the value
+    """
+    names = pd.unique(pd.Series(values, dtype=object))
+    return pd.Series(np.arange(len(names), dtype=np.int64), index=pd.Index(names, dtype=object), name='id')
+
+def extend_id_mapping(mapping, values):
+    """
+    Appends the values which are not yet part of the mapping, giving them the next free ids
+    :param mapping: Series returned by build_id_mapping
+    :param values: Series/array of names, may contain already mapped names and duplicates
+    :return mapping: The extended mapping (existing ids are never changed)
+    """
+    names = pd.unique(pd.Series(values, dtype=object))
+    names = names[mapping.index.get_indexer(names) < 0]
+    if (len(names) == 0):
+        return mapping
+    new_ids = np.arange(len(mapping), len(mapping) + len(names), dtype=np.int64)
+    return pd.concat([mapping, pd.Series(new_ids, index=pd.Index(names, dtype=object), name='id')])
+
+class GrowingIdMapping:
+    """
+    Id mapping (see build_id_mapping) extended batch after batch. The names are kept as runs of decreasing
+    sizes, each with its own hash index, and a run is only merged with the ones which are not much larger
+    than it (like the levels of an LSM tree). So every name is re-indexed O(log N) times over the whole
+    run, instead of the whole mapping being re-indexed by every extend_id_mapping call
+    """
+    def __init__(self, mapping=None):
+        self.runs = list() if (mapping is None or len(mapping) == 0) else [mapping]
+        self.num_ids = 0 if (mapping is None) else len(mapping)
+
+    def __len__(self):
+        return self.num_ids
+
+    def positions(self, values):
+        """
+        :return (run, position): Run of every value & its position in the run, -1 for the missing values
+        """
+        values = pd.Series(values, dtype=object)
+        run = np.full(len(values), -1, dtype=np.int64)
+        position = np.full(len(values), -1, dtype=np.int64)
+        for r in range(len(self.runs)):
+            missing = np.flatnonzero(run < 0)
+            if (len(missing) == 0):
+                break
+            found = self.runs[r].index.get_indexer(values.iloc[missing])
+            run[missing[found >= 0]] = r
+            position[missing[found >= 0]] = found[found >= 0]
+        return run, position
+
+    def extend(self, values):
+        """
+        Appends the values which are not yet part of the mapping, giving them the next free ids
+        """
+        names = pd.unique(pd.Series(values, dtype=object))
+        names = names[self.positions(names)[0] < 0]
+        if (len(names) == 0):
+            return
+        run = pd.Series(np.arange(self.num_ids, self.num_ids + len(names), dtype=np.int64),
+            index=pd.Index(names, dtype=object), name='id')
+        self.num_ids += len(names)
+        while (len(self.runs) != 0 and len(self.runs[-1]) <= 2 * len(run)):
+            run = pd.concat([self.runs.pop(), run])
+        self.runs.append(run)
+
+    def lookup(self, values):
+        """
+        Vectorized lookup (hash join on the index of every run) of the ids of all given values at once
+        :return ids: Nullable Int64 array with the ids, <NA> for the values missing in the mapping
+        """
+        run, position = self.positions(values)
+        ids = np.zeros(len(run), dtype=np.int64)
+        for r in range(len(self.runs)):
+            in_run = run == r
+            ids[in_run] = self.runs[r].to_numpy()[position[in_run]]
+        ids = pd.array(ids, dtype='Int64')
+        ids[run < 0] = pd.NA
+        return ids
+
+    def to_series(self):
+        """
+        :return mapping: The mapping as a single Series, like build_id_mapping
+        """
+        if (len(self.runs) == 0):
+            return build_id_mapping([])
+        return self.runs[0] if (len(self.runs) == 1) else pd.concat(self.runs)
+
+class SortedRuns:
+    """
+    Set of 64 bit keys (e.g. the row hashes of hash_pandas_object) growing batch after batch. Like
+    GrowingIdMapping, the keys are kept as sorted runs of decreasing sizes, so that adding a batch only
+    merges the runs which are not much larger than it instead of re-sorting every key seen so far
+    """
+    def __init__(self):
+        self.runs = list()
+        self.num_keys = 0
+
+    def __len__(self):
+        return self.num_keys
+
+    def add(self, keys):
+        """
+        Adds the keys to the set
+        :param keys: Array of unique uint64 keys
+        :return is_new: Mask of the keys which were not yet in the set
+        """
+        is_new = np.ones(len(keys), dtype=bool)
+        for run in self.runs:
+            positions = np.minimum(np.searchsorted(run, keys), len(run) - 1)
+            is_new &= run[positions] != keys
+        run = np.sort(keys[is_new])
+        self.num_keys += len(run)
+        while (len(self.runs) != 0 and len(self.runs[-1]) <= 2 * len(run)):
+            run = np.sort(np.concatenate([self.runs.pop(), run]), kind='stable')  # merge of two sorted runs
+        if (len(run) != 0):
+            self.runs.append(run)
+        return is_new
+
+def fetch_query_batches(cursor, query, batch_size=None):
+    """
+    Executes the query and yields its result as dataframes. With a batch_size the rows are pulled with
+    fetchmany() from the unbuffered cursor, so only one batch of the result is held in memory at a time
+    Note: values are kept as python objects (dtype=object) so that every batch is cleaned the same way,
+    e.g. an int column is not turned into floats only in the batches which contain NULLs. The cursors of
+    the ADBC drivers return arrow record batches instead, which are kept as arrow columns (pd.ArrowDtype)
+    :param cursor: Cursor of the database connection (must be unbuffered for bounded memory)
+    :param query: sql query to execute
+    :param batch_size: Number of rows per dataframe, None yields the whole result as a single dataframe
+    """
+    cursor.execute(query)
+    if (hasattr(cursor, "fetch_record_batch")):
+        yield from fetch_arrow_batches(cursor, batch_size)
+        return
+
+    columns = [column[0] for column in cursor.description]
+    if (batch_size is None):
+        yield pd.DataFrame(cursor.fetchall(), columns=columns, dtype=object)
+        return
+
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if (len(rows) == 0):
+            break
+        yield pd.DataFrame(rows, columns=columns, dtype=object)
+
+def fetch_arrow_batches(cursor, batch_size=None):
+    """
+    Yields the result of the query executed by an ADBC cursor as dataframes of arrow columns. The record
+    batches of the driver are regrouped into batch_size rows
+    """
+    try:
+        if (batch_size is None):
+            yield cursor.fetch_arrow_table().to_pandas(types_mapper=pd.ArrowDtype)
+            return
+        yield from regroup_arrow_batches(cursor.fetch_record_batch(), batch_size)
+    except OSError as err:  # e.g. a column with values of several types, which the sqlite driver can't read
+        print("Error: the ADBC driver failed to read a query result (" + str(err) + "), "
+              "use sqlite_driver: sqlite3 for columns with values of several types")
+        exit(1)
+
+def regroup_arrow_batches(reader, batch_size):
+    """
+    Yields the record batches of the reader as dataframes of batch_size rows
+    """
+    pending = list()
+    num_pending = 0
+    for record_batch in reader:
+        pending.append(record_batch)
+        num_pending += record_batch.num_rows
+        while (num_pending >= batch_size):
+            table = pa.Table.from_batches(pending, reader.schema)
+            yield table.slice(0, batch_size).to_pandas(types_mapper=pd.ArrowDtype)
+            pending = table.slice(batch_size).to_batches()
+            num_pending -= batch_size
+    if (num_pending != 0):
+        yield pa.Table.from_batches(pending, reader.schema).to_pandas(types_mapper=pd.ArrowDtype)
+
+def drop_invalid_entries(result):
+    """
+    Drops the rows of a cleaned result with an invalid entry in any column
+    """
+    for col in reversed(range(result.shape[1])):
+        result = result[~result.iloc[:, col].isin(INVALID_ENTRY_LIST)]  # clean invalid data
+    return result
+
+def drop_seen_rows(result, seen_keys):
+    """
+    Removes the rows of a (cleaned & deduplicated) batch which were already returned by earlier batches
+    of the same query. Rows are tracked by a 64 bit hash, so the state kept is 8 bytes per unique row
+    :param result: Batch of the query result
+    :param seen_keys: SortedRuns with the hashes of the rows of the earlier batches, updated with the new rows
+    :return result: The new rows of the batch
+    """
+    return result[seen_keys.add(pd.util.hash_pandas_object(result, index=False).to_numpy())]
+
+class TextEdgeWriter:
+    """
+    Writes the src, rel, dst batches to a tab separated edge list file as they are produced, and the node &
+    relation id mappings next to it once all the edges are written
+    With split_names, the edges of every split (see SplitEdgeWriter) go to <split name>_edges(t2g).txt instead
+    """
+    def __init__(self, path, split_names=None):
+        self.path = Path(path)
+        if (split_names is None):
+            self.files = [open(self.path, 'w')]
+        else:
+            self.files = [open(self.path.parent / Path(name + "_edges(t2g).txt"), 'w') for name in split_names]
+
+    def write(self, batch, split=0):
+        batch.to_csv(self.files[split], sep='\t', header=False, index=False)
+
+    def close(self, node_mapping, rel_mapping):
+        for file in self.files:
+            file.close()
+        node_mapping.to_csv(self.path.parent / Path("node_mapping.txt"), sep='\t', header=False)
+        rel_mapping.to_csv(self.path.parent / Path("relation_mapping.txt"), sep='\t', header=False)
+
+class BinaryEdgeWriter:
+    """
+    Writes the edges in the preprocessed format of Marius, so they can be trained on without its preprocessing:
+    edges/train_edges.bin holds the (src, rel, dst) rows as int32/int64 ids, next to nodes/node_mapping.txt,
+    edges/relation_mapping.txt & dataset.yaml. With num_partitions, the node ids are split in num_partitions
+    ranges of equal size and the edges are bucketed by (src partition, dst partition) for the disk based
+    training, the size of every bucket being written to edges/train_partition_offsets.txt
+    With split_names, the edges of the other splits (see SplitEdgeWriter) go to edges/validation_edges.bin &
+    edges/test_edges.bin, which are not bucketed
+    Note: edges with an unmapped endpoint are dropped since there is no id to write for them
+    """
+    def __init__(self, directory, id_dtype="int32", num_partitions=None, split_names=None):
+        self.directory = Path(directory)
+        (self.directory / Path("edges")).mkdir(parents=True, exist_ok=True)
+        (self.directory / Path("nodes")).mkdir(parents=True, exist_ok=True)
+        self.dtype = np.dtype(id_dtype)
+        self.num_partitions = num_partitions if (num_partitions is not None and num_partitions > 1) else None
+        self.path = self.directory / Path("edges/train_edges.bin")
+
+        # edges can only be bucketed once all the node ids are known, until then they are appended unordered
+        self.unordered_path = self.path if (self.num_partitions is None) else self.path.with_suffix('.unordered')
+        self.file = open(self.unordered_path, 'wb')
+        self.num_edges = 0
+        self.num_dropped = 0
+        split_names = split_names[1:] if (split_names is not None) else []
+        self.split_files = [open(self.directory / Path("edges/" + name + "_edges.bin"), 'wb') for name in split_names]
+        self.num_split_edges = [0] * len(split_names)
+
+    def write(self, batch, split=0):
+        valid = (batch["src"].notna() & batch["dst"].notna()).to_numpy()
+        self.num_dropped += int((~valid).sum())
+        edges = batch[valid].to_numpy(dtype=np.int64)
+        if (len(edges) != 0 and edges.max() > np.iinfo(self.dtype).max):
+            print(f'Error: ids do not fit in {self.dtype}, use id_dtype: int64')
+            exit(1)
+        if (split == 0):
+            self.file.write(edges.astype(self.dtype).tobytes())
+            self.num_edges += len(edges)
+        else:
+            self.split_files[split - 1].write(edges.astype(self.dtype).tobytes())
+            self.num_split_edges[split - 1] += len(edges)
+
+    def close(self, node_mapping, rel_mapping):
+        self.file.close()
+        for file in self.split_files:
+            file.close()
+        if (self.num_partitions is not None):
+            bucket_sizes = self.bucket_edges(len(node_mapping))
+            np.savetxt(self.directory / Path("edges/train_partition_offsets.txt"), bucket_sizes, fmt='%d')
+        if (self.num_dropped != 0):
+            print(f'{self.num_dropped} edges with an unmapped endpoint were not written to {self.path}')
+
+        node_mapping.to_csv(self.directory / Path("nodes/node_mapping.txt"), sep='\t', header=False)
+        rel_mapping.to_csv(self.directory / Path("edges/relation_mapping.txt"), sep='\t', header=False)
+        OmegaConf.save(OmegaConf.create({
+            "dataset_dir": str(self.directory.absolute()),
+            "num_edges": self.num_edges + sum(self.num_split_edges),
+            "num_nodes": len(node_mapping),
+            "num_relations": len(rel_mapping),
+            "num_train": self.num_edges,
+            "num_valid": self.num_split_edges[0] if (len(self.num_split_edges) != 0) else 0,
+            "num_test": self.num_split_edges[1] if (len(self.num_split_edges) != 0) else 0,
+            "num_partitions": self.num_partitions if (self.num_partitions is not None) else 1,
+        }), self.directory / Path("dataset.yaml"))
+
+    def bucket_edges(self, num_nodes):
+        """
+        Rewrites the unordered edges to train_edges.bin grouped by (src partition, dst partition) buckets,
+        in the src partition major order. Both files are memory-mapped & processed EDGE_CHUNK_ROWS edges
+        at a time: one pass counts the size of every bucket, a second one scatters the edges to their bucket
+        :return bucket_sizes: Number of edges in every bucket
+        """
+        num_buckets = self.num_partitions * self.num_partitions
+        partition_size = max(1, -(-num_nodes // self.num_partitions))
+        bucket_sizes = np.zeros(num_buckets, dtype=np.int64)
+        if (self.num_edges == 0):
+            open(self.path, 'wb').close()
+            self.unordered_path.unlink()
+            return bucket_sizes
+
+        unordered = np.memmap(self.unordered_path, dtype=self.dtype, mode='r', shape=(self.num_edges, 3))
+        for start in range(0, self.num_edges, EDGE_CHUNK_ROWS):
+            chunk = unordered[start:start + EDGE_CHUNK_ROWS]
+            buckets = (chunk[:, 0] // partition_size) * self.num_partitions + chunk[:, 2] // partition_size
+            bucket_sizes += np.bincount(buckets, minlength=num_buckets)
+
+        edges = np.memmap(self.path, dtype=self.dtype, mode='w+', shape=(self.num_edges, 3))
+        next_position = np.concatenate([[0], np.cumsum(bucket_sizes)[:-1]])
+        for start in range(0, self.num_edges, EDGE_CHUNK_ROWS):
+            chunk = unordered[start:start + EDGE_CHUNK_ROWS]
+            buckets = (chunk[:, 0] // partition_size) * self.num_partitions + chunk[:, 2] // partition_size
+            order = np.argsort(buckets, kind='stable')
+            sorted_buckets = buckets[order]
+            rank_in_bucket = np.arange(len(order)) - np.searchsorted(sorted_buckets, sorted_buckets, side='left')
+            edges[next_position[sorted_buckets] + rank_in_bucket] = chunk[order]
+            next_position += np.bincount(buckets, minlength=num_buckets)
+
+        edges.flush()
+        del edges, unordered
+        self.unordered_path.unlink()
+        return bucket_sizes
+
+# Persistent id store
+def read_id_store_manifest(store_dir):
+    """
+    Reads the manifest of the id store, which has the number of node ids, relation ids & edges stored, the
+    size of the id files when they were last completely written and the name of the file of the stored edges
+    """
+    path = Path(store_dir) / Path("manifest.json")
+    if (not path.exists()):
+        return {"num_nodes": 0, "num_relations": 0, "num_edges": 0, "node_ids_size": 0, "relation_ids_size": 0,
+            "edges_file": None}
+    with open(path, 'r') as file:
+        manifest = json.load(file)
+    manifest.setdefault("edges_file", "edges.bin")  # stores written before the edges file had a name of its own
+    return manifest
+
+def read_id_store_mapping(path, num_ids):
+    """
+    Reads the first num_ids (name, id) rows of an id file of the store, as a mapping like build_id_mapping
+    """
+    if (num_ids == 0):
+        return build_id_mapping([])
+    ids = pd.read_csv(path, sep='\t', header=None, names=["name", "id"], dtype={"name": object, "id": np.int64},
+        keep_default_na=False, nrows=num_ids)
+    if (len(ids) != num_ids or not (ids["id"].to_numpy() == np.arange(num_ids)).all()):
+        print(f'Error: the id store file {path} is corrupted')
+        exit(1)
+    return pd.Series(ids["id"].to_numpy(), index=pd.Index(ids["name"], dtype=object), name='id')
+
+def append_id_store_mapping(path, mapping, num_stored_ids, stored_size):
+    """
+    Appends the ids after the first num_stored_ids to an id file of the store. Whatever follows the stored_size
+    first bytes (left by an interrupted run) is dropped first
+    :return size: The new size of the file
+    """
+    with open(path, 'a') as file:
+        file.truncate(stored_size)
+        mapping.iloc[num_stored_ids:].to_csv(file, sep='\t', header=False)
+    return os.path.getsize(path)
+
+def load_id_store(store_dir):
+    """
+    Loads the node & relation ids given by the earlier runs, so that they keep the same ids in this run. The store
+    is append-only: new nodes & relations get the next free ids (see IdStoreEdgeWriter)
+    :param store_dir: Directory of the id store, created by the first run
+    :return (node_mapping, rel_mapping): Mappings like build_id_mapping, empty if the store does not exist yet
+    """
+    manifest = read_id_store_manifest(store_dir)
+    node_mapping = read_id_store_mapping(Path(store_dir) / Path("node_ids.txt"), manifest["num_nodes"])
+    rel_mapping = read_id_store_mapping(Path(store_dir) / Path("relation_ids.txt"), manifest["num_relations"])
+    print(f'Id store: {len(node_mapping)} node ids & {len(rel_mapping)} relation ids loaded from {store_dir}')
+    return node_mapping, rel_mapping
+
+def edge_keys(edges, num_nodes, num_rels):
+    """
+    Packs (src, rel, dst) id rows into keys which can be sorted & searched: a single uint64 when the ids are small
+    enough, otherwise a structured view of the rows (slower to sort)
+    """
+    if (num_nodes * num_nodes * max(num_rels, 1) < (1 << 64)):
+        edges = edges.astype(np.uint64)
+        return (edges[:, 0] * np.uint64(num_rels) + edges[:, 1]) * np.uint64(num_nodes) + edges[:, 2]
+    return np.ascontiguousarray(edges, dtype=np.int64).view(
+        np.dtype([("src", np.int64), ("rel", np.int64), ("dst", np.int64)])).ravel()
+
+class IdStoreEdgeWriter:
+    """
+    Wraps the writer of the output_format to keep the id store up to date. Once all the edges are written,
+    the new node & relation ids are appended to the store and the edges of the run replace the stored ones.
+    With a delta_path, the edges which were not part of the previous run are also written there
+    Note: the edges of every run go to a file of their own, named in the manifest, and the manifest is written
+    last, so an interrupted run leaves the store as it was (the files of the other runs are removed afterwards)
+    """
+    def __init__(self, writer, store_dir, delta_path=None):
+        self.writer = writer
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.delta_path = delta_path
+        edges_fd, self.edges_path = tempfile.mkstemp(prefix="edges_", suffix=".bin", dir=self.store_dir)
+        self.edges_file = os.fdopen(edges_fd, 'wb')
+        self.num_edges = 0
+
+    def write(self, batch):
+        self.writer.write(batch)
+        valid = (batch["src"].notna() & batch["dst"].notna()).to_numpy()
+        self.edges_file.write(batch[valid].to_numpy(dtype=np.int64).tobytes())
+        self.num_edges += int(valid.sum())
+
+    def close(self, node_mapping, rel_mapping):
+        self.writer.close(node_mapping, rel_mapping)
+        self.edges_file.close()
+        manifest = read_id_store_manifest(self.store_dir)
+        if (self.delta_path is not None):
+            num_delta = self.write_delta_edges(manifest, len(node_mapping), len(rel_mapping))
+            print(f'Id store: {num_delta} of the {self.num_edges} edges are new since the last run')
+
+        manifest["node_ids_size"] = append_id_store_mapping(self.store_dir / Path("node_ids.txt"), node_mapping,
+            manifest["num_nodes"], manifest["node_ids_size"])
+        manifest["relation_ids_size"] = append_id_store_mapping(self.store_dir / Path("relation_ids.txt"),
+            rel_mapping, manifest["num_relations"], manifest["relation_ids_size"])
+        manifest.update({"num_nodes": len(node_mapping), "num_relations": len(rel_mapping),
+            "num_edges": self.num_edges, "edges_file": Path(self.edges_path).name})
+        with open(self.store_dir / Path("manifest.tmp"), 'w') as file:
+            json.dump(manifest, file)
+        os.replace(self.store_dir / Path("manifest.tmp"), self.store_dir / Path("manifest.json"))
+
+        # edges of the previous run & of the interrupted ones
+        for path in list(self.store_dir.glob("edges_*.bin")) + [self.store_dir / Path("edges.bin")]:
+            if (path.name != manifest["edges_file"] and path.exists()):
+                path.unlink()
+
+    def write_delta_edges(self, manifest, num_nodes, num_rels):
+        """
+        Writes the edges of this run missing from the previous one to delta_path, EDGE_CHUNK_ROWS at a time
+        :param manifest: Manifest of the previous run (see read_id_store_manifest)
+        :return num_delta: Number of edges written
+        """
+        previous_keys = np.array([], dtype=np.uint64)
+        num_previous_edges = manifest["num_edges"]
+        if (num_previous_edges != 0):
+            path = self.store_dir / Path(manifest["edges_file"])
+            if (not path.exists() or path.stat().st_size != num_previous_edges * 3 * 8):
+                print(f'Error: the id store file {path} does not have the {num_previous_edges} edges of the manifest')
+                exit(1)
+            previous = np.memmap(path, dtype=np.int64, mode='r', shape=(num_previous_edges, 3))
+            previous_keys = np.sort(edge_keys(previous, num_nodes, num_rels))
+            del previous
+
+        num_delta = 0
+        with open(self.delta_path, 'w') as file:
+            if (self.num_edges == 0):
+                return 0
+            edges = np.memmap(self.edges_path, dtype=np.int64, mode='r', shape=(self.num_edges, 3))
+            for start in range(0, self.num_edges, EDGE_CHUNK_ROWS):
+                chunk = edges[start:start + EDGE_CHUNK_ROWS]
+                keys = edge_keys(chunk, num_nodes, num_rels)
+                is_new = np.ones(len(keys), dtype=bool)
+                if (len(previous_keys) != 0):
+                    positions = np.minimum(np.searchsorted(previous_keys, keys), len(previous_keys) - 1)
+                    is_new = previous_keys[positions] != keys
+                pd.DataFrame(chunk[is_new]).to_csv(file, sep='\t', header=False, index=False)
+                num_delta += int(is_new.sum())
+            del edges
+        return num_delta
+
+class SplitEdgeWriter:
+    """
+    Assigns the edges to the train, validation & test splits as they are written, every split going to its own
+    files through the writer of the output_format (see TextEdgeWriter & BinaryEdgeWriter), so the edge list does
+    not need a pass of its own to be split. The assignment is deterministic & per edge, so it does not depend on
+    the batch_size or the order of the edges: an edge goes to the split the hash of its (src, rel, dst) ids, keyed
+    by the seed, falls in. With stratified, the (src, dst) ids of the edges of every relation are hashed with a
+    key of their own derived from the seed & the relation, so every relation is split in the fractions on its
+    own (in expectation, closely for the relations with many edges) rather than sharing the hashes of the others
+    The edges of a split are shuffled in a buffer of shuffle_buffer_edges edges before being written, the whole
+    split is thus shuffled when it fits in the buffer (0 writes the edges in the order they come)
+    """
+    def __init__(self, writer, fractions, seed=0, stratified=False, shuffle_buffer_edges=0):
+        self.writer = writer
+        self.bounds = np.cumsum(np.asarray(fractions, dtype=np.float64) / sum(fractions))[:-1]
+        self.hash_key = hashlib.md5(str(seed).encode()).hexdigest()[:16]
+        self.seed = seed
+        self.stratified = stratified
+        self.rel_hash_keys = dict()  # rel id -> hash key of the relation, with stratified
+        self.rng = np.random.default_rng(seed)
+        self.shuffle_buffer_edges = shuffle_buffer_edges
+        self.buffers = [list() for fraction in fractions]
+        self.num_buffered = [0] * len(fractions)
+        self.num_edges = [0] * len(fractions)
+
+    def write(self, batch):
+        if (len(batch) == 0):
+            return
+        if (self.stratified):
+            rels = batch["rel"].to_numpy(dtype=np.int64)
+            hashes = np.empty(len(batch), dtype=np.uint64)
+            for rel in np.unique(rels):
+                if (rel not in self.rel_hash_keys):
+                    self.rel_hash_keys[rel] = hashlib.md5(f'{self.seed}:{rel}'.encode()).hexdigest()[:16]
+                in_rel = rels == rel
+                hashes[in_rel] = pd.util.hash_pandas_object(batch.loc[in_rel, ["src", "dst"]], index=False,
+                    hash_key=self.rel_hash_keys[rel]).to_numpy()
+        else:
+            hashes = pd.util.hash_pandas_object(batch, index=False, hash_key=self.hash_key).to_numpy()
+        points = (hashes >> np.uint64(11)) / float(1 << 53)
+        splits = np.searchsorted(self.bounds, points, side='right')
+
+        for split in range(len(self.buffers)):
+            edges = batch[splits == split]
+            if (len(edges) != 0):
+                self.buffers[split].append(edges)
+                self.num_buffered[split] += len(edges)
+            if (self.num_buffered[split] >= self.shuffle_buffer_edges):
+                self.flush(split)
+
+    def flush(self, split):
+        if (self.num_buffered[split] == 0):
+            return
+        edges = pd.concat(self.buffers[split], ignore_index=True)
+        if (self.shuffle_buffer_edges > 0):
+            edges = edges.iloc[self.rng.permutation(len(edges))]
+        self.writer.write(edges, split)
+        self.num_edges[split] += len(edges)
+        self.buffers[split] = list()
+        self.num_buffered[split] = 0
+
+    def close(self, node_mapping, rel_mapping):
+        for split in range(len(self.buffers)):
+            self.flush(split)
+        self.writer.close(node_mapping, rel_mapping)
+        print('Split: ' + ', '.join(f'{self.num_edges[split]} {SPLIT_NAMES[split]}'
+            for split in range(len(self.buffers))) + ' edges')
+
+def create_edge_writer(options=DEFAULT_OPTIONS):
+    """
+    Creates the writer of the output_format chosen in the options (see TextEdgeWriter & BinaryEdgeWriter),
+    wrapped to split the edges when there are split_fractions (see SplitEdgeWriter) and to update the id store
+    when there is an id_store_dir (see IdStoreEdgeWriter)
+    """
+    split_names = SPLIT_NAMES if (options["split_fractions"] is not None) else None
+    if (options["output_format"] == "text"):
+        writer = TextEdgeWriter(output_dir / Path("all_edges(t2g).txt"), split_names)
+    elif (options["output_format"] == "binary"):
+        writer = BinaryEdgeWriter(output_dir, options["id_dtype"], options["num_partitions"], split_names)
+    else:
+        print("Error: output_format should be text or binary")
+        exit(1)
+
+    if (options["split_fractions"] is not None):
+        writer = SplitEdgeWriter(writer, options["split_fractions"], options["split_seed"],
+            options["split_stratified"], options["shuffle_buffer_edges"])
+
+    if (options["id_store_dir"] is not None):
+        delta_path = output_dir / Path("delta_edges(t2g).txt") if (options["delta_edges"]) else None
+        writer = IdStoreEdgeWriter(writer, options["id_store_dir"], delta_path)
+    return writer
+
+# Node features
+FEATURE_ENCODINGS = ["multi_hot", "float32", "bucketized"]
+
+def node_features_dir(options=DEFAULT_OPTIONS):
+    """
+    Returns the directory the node feature matrices are written to, next to the node mapping of the output_format
+    """
+    if (options["output_format"] == "binary"):
+        return output_dir / Path("nodes")
+    return output_dir
+
+def write_node_features(directory, rel, src, values, encoding, num_nodes, num_buckets=16):
+    """
+    Writes the feature values of the nodes for a relation as a dense float32 matrix aligned with the node ids
+    (row n holds the features of node n), memory-mapped to <rel>_features.npy, the label of every column being
+    written to <rel>_features.txt:
+    - multi_hot: one column per distinct value, 1 for the values of the node (one-hot if it has a single value)
+    - float32: a single column with the value as a number, the mean if the node has several values. The values
+      which are not numbers are dropped, with a warning if there is no number at all
+    - bucketized: the values as numbers, in num_buckets ranges holding about as many values each (quantiles),
+      one column per range with 1 for the ranges of the values of the node
+    The rows of the nodes without a value (including the feature value nodes of the other relations) are 0, NaN
+    for float32
+    :param src: Node ids of the entity nodes (see GrowingIdMapping.lookup), the unmapped ones are dropped
+    :param values: Cleaned feature values, aligned with src
+    :return (num_columns, num_nodes_with_value):
+    """
+    mapped = np.asarray(pd.notna(src), dtype=bool)
+    src = np.asarray(src[mapped], dtype=np.int64)
+    values = column_to_objects(values)[mapped].astype(str)
+    if (encoding != "multi_hot"):
+        numbers = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+        src = src[~np.isnan(numbers)]
+        numbers = numbers[~np.isnan(numbers)]
+        if (len(values) != 0 and len(numbers) == 0):
+            print(f'Warning: none of the {len(values)} values of {rel} is a number, its {encoding} features are '
+                'empty (multi_hot encodes the values which are not numbers)')
+
+    if (encoding == "multi_hot"):
+        codes, labels = pd.factorize(values, sort=True)
+        columns = codes
+    elif (encoding == "float32"):
+        labels = [rel]
+        columns = np.zeros(len(src), dtype=np.int64)
+    elif (encoding == "bucketized"):
+        boundaries = np.unique(np.quantile(numbers, np.linspace(0, 1, num_buckets + 1)[1:-1])) \
+            if (len(numbers) != 0) else np.array([])
+        bounds = ['-inf'] + [str(bound) for bound in boundaries] + ['inf']
+        labels = ['[' + bounds[b] + ', ' + bounds[b + 1] + ')' for b in range(len(boundaries) + 1)]
+        columns = np.searchsorted(boundaries, numbers, side='right')
+
+    path = Path(directory) / Path(re.sub(r'[^\w.-]', '_', rel) + "_features")
+    matrix = np.lib.format.open_memmap(path.with_suffix(".npy"), mode='w+', dtype=np.float32,
+        shape=(num_nodes, len(labels)))
+    if (encoding == "float32"):
+        sums = np.bincount(src, weights=numbers, minlength=num_nodes)
+        counts = np.bincount(src, minlength=num_nodes)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            matrix[:, 0] = np.where(counts != 0, sums / counts, np.nan)
+    else:
+        matrix[src, columns] = 1.0
+    matrix.flush()
+    del matrix
+    pd.Series(range(len(labels)), index=labels).to_csv(path.with_suffix(".txt"), sep='\t', header=False)
+    return len(labels), len(np.unique(src))
 
 # TODO: Why do we lower case things before processing?
-def entity_node_to_uuids(cursor, entity_queries_list):
+def entity_prefixes(entity_queries_list):
+    """
+    Returns the table_col_ prefix of the entity nodes of every entity query
+    """
+    # extracting table and column names
+    # TODO: Improve table name extraction logic to better formatting
+    prefix_list = list()
+    for entity_query in entity_queries_list:
+        table_name = entity_query.split()[2].split('.')[0]  # table name of the query to execute
+        col_name = str(entity_query.split()[2].split('.')[1]) # column name of the query
+        prefix_list.append(table_name + '_' + col_name + '_')
+    return prefix_list
+
+def edge_prefixes(edge_queries_list, num_entity_entity):
+    """
+    Returns the table_col_ prefixes of the src entity nodes of every edge query, and of the dst entity nodes
+    of the num_entity_entity first ones (feature values have no prefix)
+    :return (src_prefix_list, dst_prefix_list):
+    """
+    # TODO: Table Name splitting needs to be more robust - right now we are assuming that position 1 and 2
+    # will always be src and dst. Is that a correct assumption in our paradigm think?
+    src_prefix_list = list()
+    dst_prefix_list = list()
+    for query in edge_queries_list:
+        table_name_list = re.split(' ', query)  # table name of the query to execute
+        table_name1 = table_name_list[1].split('.')[0] # src table
+        col_name1 = table_name_list[1].split('.')[1][:-1] # src column, (note last character ',' is removed)
+        src_prefix_list.append(table_name1 + "_" + col_name1 + '_')
+        if (len(dst_prefix_list) < num_entity_entity):
+            table_name2 = table_name_list[2].split('.')[0] # dst/target table
+            col_name2 = table_name_list[2].split('.')[1] # dst/target column
+            dst_prefix_list.append(table_name2 + "_" + col_name2 + '_')
+    return src_prefix_list, dst_prefix_list
+
+def entity_node_to_uuids(query_results, entity_queries_list, entity_mapping=None):
     """
-    Takes entity node queries as inputs, execute the queries, store the results in temp dataframes,
+    Takes the results of the entity node queries as inputs (see execute_query_units),
     then concatenate each entity node with its respective table name & column name, 
-    convert each into uuid, and store the mapping in dictionary
+    and assign a dense integer id to every entity node in bulk
     Assumption: Entries are case insentitive, i.e. BOB and bob are considered as duplicates
+    :param query_results: (query index, cleaned batch) pairs of the entity_queries_list queries
+    :param entity_mapping: Existing node ids to keep (e.g. from load_id_store), new nodes get the next ids
+    :return entity_mapping: Series indexed by entity node name with its integer id as the value
     """
-    entity_mapping = pd.DataFrame()
+    entity_mapping = GrowingIdMapping(entity_mapping)
+    prefix_list = entity_prefixes(entity_queries_list)
 
-    for i in range(len(entity_queries_list)):
-        entity_query = entity_queries_list[i]
+    # ids are assigned in the order the entity nodes are first seen
+    for i, result in query_results:
+        # concatenate each entity node with its respective table name, entries in lower case
+        entity_nodes = (prefix_list[i] + result.iloc[:, 0].map(str)).str.lower()
+        entity_mapping.extend(entity_nodes)
 
-        # Executing Part
-        cursor.execute(entity_query)
-        result = pd.DataFrame(cursor)
-        result.columns = cursor.column_names
-        #print(f'result\n{result}')
+    return entity_mapping.to_series()
 
-        # extracting table and column names
-        # TODO: Improve table name extraction logic to better formatting
-        table_name = entity_query.split()[2].split('.')[0]  # table name of the query to execute
-        col_name = str(entity_query.split()[2].split('.')[1]) # column name of the query
+def run_query_unit(cursor, unit, options=DEFAULT_OPTIONS, cache_key=None, stats=None):
+    """
+    Executes one unit of work (see plan_shared_scans) and yields the cleaned & deduplicated batches of each
+    of its queries as (query index, batch) pairs. Tokens are cleaned once per scan, then every query
+    projects its columns and drops its own invalid & duplicate rows
+    :param options: Optional settings (see DEFAULT_OPTIONS), batch_size, cache_dir, checkpoint_dir, spill_dir &
+        the cleaning_* ones are used. With a spill_dir, the duplicates across batches are left to
+        external_post_processing
+    :param cache_key: Key of the unit in the cache_dir or checkpoint_dir (see query_cache_key & unit_results_dir).
+        A cached result is read instead of running the query, otherwise the batches are cached as they are
+        produced
+    :param stats: dict of query index -> statistics (see new_query_stats), updated with the ones of the
+        queries of the unit. The fetch & cleaning time of a shared scan is split evenly between its queries
+    """
+    members, query = unit
+    if (stats is None):
+        stats = dict()
+    for i, projections in members:
+        stats.setdefault(i, new_query_stats())
 
-        result = result.applymap(clean_token)  # strip tokens and lower case strings
-        result = result[~result.iloc[:, 0].isin(INVALID_ENTRY_LIST)] # cleaning invalid entries
-        # maybe re-index once here?
+    start = time.perf_counter()
+    if (cache_key is not None):
+        results_dir = unit_results_dir(options)
+        if ((Path(results_dir) / Path(cache_key + ".pkl")).exists()):
+            for i, result in read_cached_unit(results_dir, cache_key):
+                stats[i]["cached"] = True
+                stats[i]["fetch_seconds"] += time.perf_counter() - start
+                stats[i]["rows"] += len(result)
+                yield i, result
+                start = time.perf_counter()
+            return
+        cache_fd, cache_tmp_path = tempfile.mkstemp(suffix=".tmp", dir=results_dir)
+        cache_file = os.fdopen(cache_fd, 'wb')
 
-        # concatenate each entity node with its respective table nam
-        result[result.columns[0]] = table_name + '_' + col_name + '_' + result[result.columns[0]].map(str)
-        # print(f'result\n{result}')
+    batch_size = options["batch_size"]
+    seen_keys = [SortedRuns() for member in members]
+    for result in fetch_query_batches(cursor, query, batch_size):
+        fetched = time.perf_counter()
+        # strip tokens and lower case strings
+        result = clean_tokens(result, options["cleaning_engine"], options["cleaning_workers"])
+        cleaned = time.perf_counter()
+        for m in range(len(members)):
+            i, projections = members[m]
+            filter_start = time.perf_counter()
+            stats[i]["fetch_seconds"] += (fetched - start) / len(members)
+            stats[i]["clean_seconds"] += (cleaned - fetched) / len(members)
+            if (projections is None):
+                member_result = result
+            else:
+                member_result = pd.concat([result.iloc[:, list(columns)].set_axis(range(len(columns)), axis=1)
+                    for columns in projections], ignore_index=True)
+            num_rows = len(member_result)
+            member_result = drop_invalid_entries(member_result)
+            num_valid = len(member_result)
+            member_result = member_result.drop_duplicates()
+            if (batch_size is not None and options["spill_dir"] is None):
+                member_result = drop_seen_rows(member_result, seen_keys[m])
+            stats[i]["rows_fetched"] += num_rows
+            stats[i]["rows_invalid"] += num_rows - num_valid
+            stats[i]["rows_duplicate"] += num_valid - len(member_result)
+            stats[i]["rows"] += len(member_result)
+            stats[i]["peak_rss_mb"] = max(stats[i]["peak_rss_mb"], current_rss() / (1 << 20))
+            if (cache_key is not None):
+                pickle.dump((i, member_result), cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+            stats[i]["filter_seconds"] += time.perf_counter() - filter_start
+            yield i, member_result
+        start = time.perf_counter()
 
-        result['uuid'] = ''
-        result.columns = ['entity_node', 'uuid']
+    # the result is only cached once complete
+    if (cache_key is not None):
+        cache_file.close()
+        os.replace(cache_tmp_path, Path(results_dir) / Path(cache_key + ".pkl"))
 
-        result['entity_node'] = result['entity_node'].str.lower() # entries in lower case
-        result = result.drop_duplicates() # removing duplicates
+# Query cost preflight
+def fetch_rows_as_dicts(cursor):
+    """
+    Fetches the rows of the last query as dicts of column name -> value (bytes values are decoded)
+    """
+    names = [column[0] for column in cursor.description]
+    return [{name: (value.decode() if isinstance(value, (bytes, bytearray)) else value)
+        for name, value in zip(names, row)} for row in cursor.fetchall()]
 
-        # convert each entity node to uuid
-        for index, row in result.iterrows():
-            result.at[index, 'uuid'] = get_uuid(result.at[index, result.columns[0]])
+def join_key_columns(query):
+    """
+    Returns the equality join predicates (a.x = b.y) of the WHERE & ON clauses of a query. Predicates on
+    table aliases are skipped, only the tables listed in the FROM clauses are recognized (see query_tables)
+    :return join_keys: List of ((table, column), (table, column)) pairs
+    """
+    tables = query_tables(query)
+    join_keys = list()
+    for left_table, left_column, right_table, right_column in re.findall(r'\b(\w+)\.(\w+)\s*=\s*(\w+)\.(\w+)\b',
+        query):
+        join_key = ((left_table, left_column), (right_table, right_column))
+        if (left_table != right_table and left_table in tables and right_table in tables
+            and join_key not in join_keys):
+            join_keys.append(join_key)
+    return join_keys
 
-        entity_mapping = pd.concat([entity_mapping, result])
-    return entity_mapping.set_index('entity_node').to_dict()['uuid']
+def indexed_columns(cursor, table, db_server='maria-db'):
+    """
+    Returns the lower cased names of the columns of a table which lead an index (primary keys included), i.e.
+    the columns an index can be looked up by
+    """
+    columns = set()
+    if (db_server in ('maria-db', 'mysql')):
+        cursor.execute("SHOW INDEX FROM " + table + ";")
+        columns = {row["Column_name"].lower() for row in fetch_rows_as_dicts(cursor) if (row["Seq_in_index"] == 1)}
+    elif (db_server == 'postgres'):
+        cursor.execute("SELECT a.attname FROM pg_index i JOIN pg_attribute a ON a.attrelid = i.indrelid "
+            "AND a.attnum = i.indkey[0] WHERE i.indrelid = '" + table.replace("'", "''") + "'::regclass;")
+        columns = {row[0].lower() for row in cursor.fetchall()}
+    elif (db_server == 'sqlite'):
+        cursor.execute("PRAGMA index_list(" + table + ");")
+        for index in [row[1] for row in cursor.fetchall()]:
+            cursor.execute("PRAGMA index_info(" + index + ");")
+            columns.update(row[2].lower() for row in cursor.fetchall() if (row[0] == 0 and row[2] is not None))
+        # an INTEGER PRIMARY KEY is the rowid of the table, it has no index of its own
+        cursor.execute("PRAGMA table_info(" + table + ");")
+        primary_keys = [row for row in cursor.fetchall() if (row[5] != 0)]
+        if (len(primary_keys) == 1 and primary_keys[0][2].upper() == "INTEGER"):
+            columns.add(primary_keys[0][1].lower())
+    return columns
+
+def explain_query(cursor, query, db_server='maria-db', row_counts=None):
+    """
+    Runs EXPLAIN on a query without executing it
+    :param row_counts: dict of table name -> number of rows, filled as the tables are counted (sqlite has no
+        row estimates, the rows of the scanned tables are counted instead)
+    :return estimated_rows: Rows the query is expected to read (maria-db/mysql & sqlite, the product of the rows
+        of the nested loops of every SELECT) or to return (postgres)
+    :return cost: Cost the queries are ranked by, the planner's total cost for postgres, estimated_rows otherwise
+    :return full_scans: List of the tables read in full
+    """
+    if (row_counts is None):
+        row_counts = dict()
+    full_scans = list()
+    if (db_server in ('maria-db', 'mysql')):
+        cursor.execute("EXPLAIN " + query)
+        selects = dict()
+        for row in fetch_rows_as_dicts(cursor):
+            if (row["rows"] is None):
+                continue  # UNION RESULT & the like, reading the temporary tables of the other rows
+            filtered = row["filtered"] if (row.get("filtered") is not None) else 100.0
+            selects[row["id"]] = selects.get(row["id"], 1.0) * float(row["rows"]) * float(filtered) / 100.0
+            if (row["type"] == "ALL" and row["table"] not in full_scans):
+                full_scans.append(row["table"])
+        estimated_rows = sum(selects.values())
+        cost = estimated_rows
+    elif (db_server == 'postgres'):
+        cursor.execute("EXPLAIN (FORMAT JSON) " + query)
+        plan = cursor.fetchall()[0][0]
+        if (isinstance(plan, str)):
+            plan = json.loads(plan)
+        plan = plan[0]["Plan"]
+        estimated_rows = float(plan["Plan Rows"])
+        cost = float(plan["Total Cost"])
+        nodes = [plan]
+        while (len(nodes) != 0):
+            node = nodes.pop()
+            if (node["Node Type"] == "Seq Scan" and node["Relation Name"] not in full_scans):
+                full_scans.append(node["Relation Name"])
+            nodes.extend(node.get("Plans", []))
+    elif (db_server == 'sqlite'):
+        cursor.execute("EXPLAIN QUERY PLAN " + query)
+        # the steps with the same parent are the nested loops of one SELECT
+        selects = dict()
+        for step_id, parent, _, detail in cursor.fetchall():
+            step = re.match(r'(SCAN|SEARCH) (?:TABLE )?(\w+)', detail)
+            if (step is None):
+                continue
+            table = step.group(2)
+            if (step.group(1) == "SCAN"):
+                if (table not in row_counts):
+                    cursor.execute("SELECT COUNT(*) FROM " + table + ";")
+                    row_counts[table] = cursor.fetchall()[0][0]
+                selects[parent] = selects.get(parent, 1.0) * max(row_counts[table], 1)
+                if (table not in full_scans):
+                    full_scans.append(table)
+            else:
+                selects[parent] = selects.get(parent, 1.0)
+        estimated_rows = sum(selects.values())
+        cost = estimated_rows
+    return estimated_rows, cost, full_scans
+
+def preflight_queries(cursor, units, db_server='maria-db'):
+    """
+    Runs EXPLAIN on every query before any data is pulled and prints them ranked by estimated cost, with the
+    tables they read in full & their join keys which have no index on either side
+    :param units: List of (label, query) pairs
+    :param db_server: Server the cursor is connected to (see connect_to_db)
+    :return missing_indexes: List of the (table, column) pairs to index, the right hand side of every join
+        predicate with no index on either side (usually the key the other table refers to)
+    """
+    indexes = dict()
+    row_counts = dict()
+    report = list()
+    missing_indexes = list()
+    for label, query in units:
+        estimated_rows, cost, full_scans = explain_query(cursor, query, db_server, row_counts)
+        unindexed_joins = list()
+        for left, right in join_key_columns(query):
+            for table, column in (left, right):
+                if (table not in indexes):
+                    indexes[table] = indexed_columns(cursor, table, db_server)
+            if (left[1].lower() not in indexes[left[0]] and right[1].lower() not in indexes[right[0]]):
+                unindexed_joins.append(left[0] + '.' + left[1] + ' = ' + right[0] + '.' + right[1])
+                if (right not in missing_indexes):
+                    missing_indexes.append(right)
+        report.append((cost, estimated_rows, label, full_scans, unindexed_joins))
+
+    report.sort(key=lambda entry: entry[0], reverse=True)
+    print(f'Preflight: {len(report)} queries/scans ranked by estimated cost')
+    for rank, (cost, estimated_rows, label, full_scans, unindexed_joins) in enumerate(report):
+        line = f'{rank + 1:>4}. {label}: ~{estimated_rows:.3g} rows'
+        if (db_server == 'postgres'):
+            line += f', cost {cost:.3g}'
+        if (len(full_scans) != 0):
+            line += ', full scan of ' + ', '.join(full_scans)
+        if (len(unindexed_joins) != 0):
+            line += ', no index on join key ' + ', '.join(unindexed_joins)
+        print(line)
+    if (len(missing_indexes) != 0):
+        print('Preflight: join keys without an index: '
+            + ', '.join(table + '.' + column for table, column in missing_indexes))
+    return missing_indexes
+
+def create_temporary_indexes(cnx, cursor, columns, db_server='maria-db'):
+    """
+    Creates an index on every (table, column) pair, for the duration of the run (see drop_temporary_indexes).
+    The indexes which can not be created (read-only database, TEXT column without a prefix length on
+    maria-db/mysql, ...) are skipped with a warning
+    :return indexes: List of the (index name, table) pairs created
+    """
+    indexes = list()
+    for table, column in columns:
+        name = "t2g_tmp_" + table + "_" + column
+        try:
+            cursor.execute("CREATE INDEX " + name + " ON " + table + " (" + column + ");")
+            cnx.commit()
+        except Exception as err:
+            cnx.rollback()
+            print(f'Warning: could not create a temporary index on {table}.{column}: {err}')
+            continue
+        indexes.append((name, table))
+        print(f'Created the temporary index {name}')
+    return indexes
+
+def drop_temporary_indexes(db_server, db_name, indexes, options=DEFAULT_OPTIONS):
+    """
+    Drops the indexes created by create_temporary_indexes, on a connection of its own: main drops them once the
+    run is done, after closing the connection of the run, and registers this with atexit as a fallback for the
+    runs whose drop fails
+    :param db_name: The name of the database, an absolute path for sqlite since the cwd may have changed at exit
+    """
+    if (len(indexes) == 0):
+        return
+    cnx, cursor = connect_to_db(db_server, db_name, None, options)
+    cursor = command_cursor(cnx, cursor)
+    for name, table in indexes:
+        if (db_server in ('maria-db', 'mysql')):
+            cursor.execute("DROP INDEX " + name + " ON " + table + ";")
+        else:
+            cursor.execute("DROP INDEX " + name + ";")
+    cnx.commit()
+    cnx.close()
+    print(f'Dropped {len(indexes)} temporary indexes')
+
+# Query result cache
+def query_tables(query):
+    """
+    Returns the names of the tables listed in the FROM clauses of a query (of all the parts of a UNION) & of its
+    sub-queries. The parenthesized sub-queries are parsed on their own, their text being replaced
+    by ? in the enclosing query so that a derived table is not taken for a table
+    """
+    texts = list()
+    while True:
+        inner = re.search(r'\(([^()]*)\)', query)
+        if (inner is None):
+            break
+        texts.append(inner.group(1))
+        query = query[:inner.start()] + ' ? ' + query[inner.end():]
+    tables = list()
+    for text in [query] + texts:
+        from_clauses = re.findall(r'\bfrom\s+(.*?)(?=\bwhere\b|\bgroup\b|\border\b|\blimit\b|\bhaving\b|\bunion\b|;|$)',
+            text, re.IGNORECASE | re.DOTALL)
+        for from_clause in from_clauses:
+            for table in re.split(r',|\b(?:(?:natural|inner|cross|left|right|full|outer)\s+)*join\b', from_clause,
+                flags=re.IGNORECASE):
+                if (len(table.split()) != 0 and table.split()[0] != '?' and table.split()[0] not in tables):
+                    tables.append(table.split()[0])
+    return tables
+
+def table_fingerprints(cursor, tables, method="update_time", db_server='maria-db'):
+    """
+    Computes a cheap fingerprint of every table, which changes when the rows of the table change
+    :param cursor: Cursor of the database connection
+    :param tables: List of table names
+    :param method: update_time (UPDATE_TIME, TABLE_ROWS & DATA_LENGTH of information_schema.TABLES for
+        maria-db/mysql, the insert/update/delete counters of pg_stat_user_tables for postgres, falling back
+        to checksum for the tables without them & for sqlite), checksum (CHECKSUM TABLE for maria-db/mysql,
+        see table_checksum otherwise, reads the whole table) or row_count (SELECT COUNT(*), misses updates
+        which keep the number of rows)
+    :param db_server: Server the cursor is connected to (see connect_to_db)
+    :return fingerprints: dict of table name -> fingerprint string
+    """
+    fingerprints = dict()
+    for table in tables:
+        fingerprint = None
+        if (method == "update_time" and db_server in ('maria-db', 'mysql')):
+            cursor.execute("SELECT UPDATE_TIME, TABLE_ROWS, DATA_LENGTH FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = '" + table.replace("'", "''") + "';")
+            rows = cursor.fetchall()
+            if (len(rows) != 0 and rows[0][0] is not None):
+                fingerprint = str(rows[0])
+        elif (method == "update_time" and db_server == 'postgres'):
+            cursor.execute("SELECT n_tup_ins, n_tup_upd, n_tup_del FROM pg_stat_user_tables "
+                "WHERE relname = '" + table.replace("'", "''") + "';")
+            rows = cursor.fetchall()
+            if (len(rows) != 0):
+                fingerprint = str(tuple(rows[0]))
+        elif (method == "row_count"):
+            cursor.execute("SELECT COUNT(*) FROM " + table + ";")
+            fingerprint = str(cursor.fetchall()[0][0])
+        elif (method not in ("update_time", "checksum")):
+            print("Error: cache_fingerprint should be update_time, checksum or row_count")
+            exit(1)
+
+        if (fingerprint is None and db_server in ('maria-db', 'mysql')):
+            cursor.execute("CHECKSUM TABLE " + table + ";")
+            fingerprint = str(cursor.fetchall()[0][1])
+        elif (fingerprint is None):
+            fingerprint = table_checksum(cursor, table)
+        fingerprints[table] = method + ":" + fingerprint
+    return fingerprints
+
+def table_checksum(cursor, table):
+    """
+    Checksum of the rows of a table computed on the client, for the servers without CHECKSUM TABLE.
+    The 64 bit hashes of the rows are summed, so the order the rows are returned in does not matter
+    """
+    checksum = np.uint64(0)
+    num_rows = 0
+    for batch in fetch_query_batches(cursor, "SELECT * FROM " + table + ";", EDGE_CHUNK_ROWS):
+        hashes = pd.util.hash_pandas_object(batch.astype(str), index=False).to_numpy()
+        checksum = checksum + hashes.sum(dtype=np.uint64)
+        num_rows += len(batch)
+    return str(num_rows) + ":" + str(checksum)
+
+def query_cache_key(unit, fingerprints, deduplicated=True):
+    """
+    Key of the cached result of a unit of work: a hash of its normalized query text, of the queries it answers
+    (see plan_shared_scans), of INVALID_ENTRY_LIST & of the fingerprints of the tables it reads
+    :param fingerprints: dict of table name -> fingerprint (see table_fingerprints)
+    :param deduplicated: False when the duplicates across batches are kept (out-of-core mode, see run_query_unit)
+    """
+    members, query = unit
+    key = {
+        "query": ' '.join(query.split()),
+        "members": [[i, projections] for i, projections in members],
+        "invalid_entries": [str(val) for val in INVALID_ENTRY_LIST],
+        "tables": [[table, fingerprints[table]] for table in query_tables(query)],
+    }
+    if (not deduplicated):
+        key["deduplicated"] = False
+    return hashlib.sha256(json.dumps(key).encode()).hexdigest()
+
+def read_cached_unit(cache_dir, cache_key):
+    """
+    Yields the (query index, batch) pairs cached for the key, in the order they were produced by run_query_unit
+    """
+    with open(Path(cache_dir) / Path(cache_key + ".pkl"), 'rb') as file:
+        while True:
+            try:
+                yield pickle.load(file)
+            except EOFError:
+                break
+
+def prune_query_cache(cache_dir, cache_keys):
+    """
+    Removes the cached results whose key is not in cache_keys, i.e. not used by the current configuration, and
+    the .tmp files left by the units of interrupted runs (see run_query_unit)
+    """
+    for path in Path(cache_dir).glob("*.pkl"):
+        if (path.stem not in cache_keys):
+            path.unlink()
+    for path in Path(cache_dir).glob("*.tmp"):
+        path.unlink()
+
+def unit_results_dir(options=DEFAULT_OPTIONS):
+    """
+    Returns the directory the results of the units of work are kept in (see run_query_unit): the cache_dir,
+    else the checkpoint_dir, None when they are not kept
+    """
+    if (options["cache_dir"] is not None):
+        return options["cache_dir"]
+    return options["checkpoint_dir"]
+
+# Checkpoints
+def read_checkpoint_manifest(checkpoint_dir):
+    """
+    Returns the manifest of the last run checkpointed to checkpoint_dir, None if there is none
+    """
+    path = Path(checkpoint_dir) / Path("manifest.json")
+    if (not path.exists()):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+def write_checkpoint_manifest(checkpoint_dir, manifest):
+    tmp_path = Path(checkpoint_dir) / Path("manifest.json.tmp")
+    with open(tmp_path, 'w') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(tmp_path, Path(checkpoint_dir) / Path("manifest.json"))
+
+def start_checkpoint(checkpoint_dir, resume=False):
+    """
+    Starts or resumes the run checkpointed to checkpoint_dir. The cleaned result of every unit of work is
+    written there by run_query_unit & renamed to <key>.pkl once complete, the key being the query_cache_key of
+    the unit with the id of the run as the fingerprint of every table. A resumed run thus reads the units
+    completed by the interrupted one instead of running them (& runs the ones whose query changed since), then
+    maps the nodes & edges & writes the output files again. A unit interrupted while its result was being written
+    only left a .tmp file, which is discarded so the unit runs again
+    :param resume: Keep the run id & the checkpoints of the last run, else a new run is started & the checkpoints
+        of the last one are removed
+    :return manifest: dict with the run_id, the time the run started & whether it is complete
+        (see finish_checkpoint), saved to checkpoint_dir/manifest.json
+    """
+    checkpoint_dir = Path(checkpoint_dir)
+    checkpoint_dir.mkdir(parents=True, exist_ok=True)
+    manifest = read_checkpoint_manifest(checkpoint_dir)
+    if (resume and manifest is None):
+        print(f'Error: there is no run to resume in {checkpoint_dir}')
+        exit(1)
+    if (resume and manifest["complete"]):
+        print(f'Run {manifest["run_id"]} checkpointed to {checkpoint_dir} is already complete, nothing to resume')
+        exit(0)
+
+    partial_results = list(checkpoint_dir.glob("*.tmp"))
+    for path in partial_results:
+        path.unlink()
+    if (resume):
+        if (len(partial_results) != 0):
+            print(f'Discarded {len(partial_results)} partly written query results, their queries run again')
+        return manifest
+
+    for path in checkpoint_dir.glob("*.pkl"):
+        path.unlink()
+    manifest = {"run_id": uuid.uuid4().hex, "started": time.strftime("%Y-%m-%dT%H:%M:%S"), "complete": False}
+    write_checkpoint_manifest(checkpoint_dir, manifest)
+    return manifest
+
+def finish_checkpoint(checkpoint_dir, manifest):
+    """
+    Marks the run as complete once its output files are written, its checkpoints are removed
+    """
+    for path in Path(checkpoint_dir).glob("*.pkl"):
+        path.unlink()
+    manifest["complete"] = True
+    write_checkpoint_manifest(checkpoint_dir, manifest)
+
+# Sampled graph
+def sample_tokens(tokens, fraction, seed=0):
+    """
+    Deterministic hash sample of cleaned tokens: a token is kept when its hash (keyed by the seed) falls in
+    the first fraction of the hash range, so a token is sampled or not whatever the query or run it comes from
+    :return mask: Boolean numpy array, True for the sampled tokens
+    """
+    hash_key = hashlib.md5(str(seed).encode()).hexdigest()[:16]
+    hashes = pd.util.hash_array(np.asarray(tokens, dtype=object), hash_key=hash_key, categorize=False)
+    return (hashes >> np.uint64(11)) < np.uint64(int(fraction * (1 << 53)))
+
+def query_node_types(entity_queries_list, edge_queries_list, num_entity_entity):
+    """
+    Returns the node type (the table_col_ prefix of the node names, see entity_prefixes & edge_prefixes) of the
+    columns of every query, None for the feature values
+    :return (entity_types, edge_types): Lists of the node types of the columns of every entity & edge query
+    """
+    src_prefix_list, dst_prefix_list = edge_prefixes(edge_queries_list, num_entity_entity)
+    entity_types = [[prefix] for prefix in entity_prefixes(entity_queries_list)]
+    edge_types = [[src_prefix_list[i], dst_prefix_list[i] if (i < num_entity_entity) else None]
+        for i in range(len(edge_queries_list))]
+    return entity_types, edge_types
+
+def sampled_unit_columns(unit, query_types):
+    """
+    Returns the columns of a unit of work which hold nodes of the same type for all of its queries, the ones
+    a sample predicate can be pushed down on
+    :param query_types: Node types of the columns of every query (see query_node_types)
+    :return columns: dict of column position in the unit's query -> node type
+    """
+    columns = None
+    for i, projections in unit[0]:
+        if (projections is None):
+            projections = [tuple(range(len(query_types[i])))]
+        member_columns = dict()
+        for positions in projections:
+            for position, node_type in zip(positions, query_types[i]):
+                if (node_type is not None):
+                    member_columns[position] = node_type
+        if (columns is None):
+            columns = member_columns
+        else:
+            columns = {position: node_type for position, node_type in columns.items()
+                if (member_columns.get(position) == node_type)}
+    return columns
+
+def pushdown_sample_predicate(expr, tokens, db_server):
+    """
+    Returns the sql predicate keeping the rows whose column expr may have one of the tokens once cleaned: the
+    cheap part of clean_token is done in sql (see pushdown_column_expr) & compared with the tokens. The values
+    the database may clean differently from python are kept as well, so the predicate never drops a row of a
+    sampled token (the exact filtering is done on the client side, see filter_sampled_results): the values
+    starting or ending with a character clean_token would also strip, the values with a non-ASCII character
+    (more bytes than characters in UTF-8, whose lower casing differs between the databases & python) and for
+    sqlite the values which are neither text nor integers (e.g. REAL, see pushdown_column_expr)
+    Note: for postgres, the non-ASCII values are only recognized in a UTF-8 encoded database
+    """
+    raw_expr = expr
+    expr = pushdown_column_expr(expr, db_server)
+    if (db_server == 'sqlite'):
+        first_char, last_char = 'SUBSTR(' + expr + ', 1, 1)', 'SUBSTR(' + expr + ', -1, 1)'
+        non_ascii = 'LENGTH(CAST(' + expr + ' AS BLOB)) <> LENGTH(' + expr + ") OR typeof(" + raw_expr \
+            + ") NOT IN ('integer', 'text')"
+    else:
+        first_char, last_char = 'LEFT(' + expr + ', 1)', 'RIGHT(' + expr + ', 1)'
+        byte_length = 'OCTET_LENGTH(' if (db_server == 'postgres') else 'LENGTH('
+        non_ascii = byte_length + expr + ') <> CHAR_LENGTH(' + expr + ')'
+    stripped_chars = ', '.join("'" + c.replace("'", "''") + "'" for c in sorted(set(PY_WHITESPACE + ".'\"")))
+    return '(' + expr + ' IN (' + ', '.join("'" + str(token).replace("'", "''") + "'" for token in sorted(tokens)) \
+        + ') OR ' + first_char + ' IN (' + stripped_chars + ') OR ' + last_char + ' IN (' + stripped_chars + ') OR ' \
+        + non_ascii + ')'
+
+def sample_unit(unit, planned_query, query_types, sample, db_server, cursor=None):
+    """
+    Pushes the sample down to the query of a unit of work: the columns holding nodes of a sampled type (see
+    sampled_unit_columns) are restricted to the sampled tokens (see pushdown_sample_predicate), or to nothing if
+    no node of their type is sampled. Like pushdown_cleaning, the columns which are neither text nor integers
+    (see pushdown_column_types, which uses the cursor) are only filtered on the client side
+    :param planned_query: Query of the unit before the pushdown_cleaning rewrite, whose columns are the raw ones
+    :param query_types: Node types of the columns of every query (see query_node_types)
+    :param sample: dict of node type -> array of the sampled tokens (see sample_graph)
+    :return unit: The unit with the predicates added, unchanged if its query is not a plain select
+    """
+    members, query = unit
+    parts = split_union_query(query)
+    planned_parts = split_union_query(planned_query)
+    if (len(parts) != len(planned_parts) or any(split_select_query(part) is None for part in parts)):
+        return unit
+    for planned_part in planned_parts:
+        parsed = split_select_query(planned_part)
+        if (parsed is None or not is_plain_select_query(planned_part, len(parsed[1]))):
+            return unit
+
+    columns = sampled_unit_columns(unit, query_types)
+    new_parts = list()
+    for part, planned_part in zip(parts, planned_parts):
+        distinct, select_list, from_where = split_select_query(part)
+        planned_select_list = split_select_query(planned_part)[1]
+        cleanable = pushdown_column_types(cursor, planned_part, db_server)
+        predicates = list()
+        for position, node_type in columns.items():
+            tokens = sample.get(node_type, [])
+            if (len(tokens) == 0):
+                predicates.append('1 = 0')
+            elif (len(tokens) <= SAMPLE_PUSHDOWN_MAX_VALUES and cleanable[position]):
+                predicates.append(pushdown_sample_predicate(planned_select_list[position], tokens, db_server))
+        if (len(predicates) != 0):
+            from_where = add_where_predicates(from_where, predicates)
+        new_parts.append('SELECT ' + ('DISTINCT ' if distinct else '') + ', '.join(select_list) + ' FROM '
+            + from_where)
+    return members, ' UNION '.join(new_parts) + ';'
+
+def filter_sampled_results(query_results, query_types, sample):
+    """
+    Keeps the rows of the (query index, cleaned batch) pairs whose nodes are all sampled, the feature values
+    being kept with their entity node
+    """
+    for i, result in query_results:
+        keep = np.ones(len(result), dtype=bool)
+        for column, node_type in enumerate(query_types[i]):
+            if (node_type is not None):
+                keep &= result.iloc[:, column].isin(sample.get(node_type, [])).to_numpy(dtype=bool)
+        yield i, result[keep]
+
+def sample_graph(cursor, entity_queries_list, entity_types, edge_queries_list, edge_types, options=DEFAULT_OPTIONS,
+    db_server='maria-db'):
+    """
+    Samples the nodes of a reduced graph, to try query configurations on in seconds: the seed nodes are a hash
+    sample (see sample_tokens) of the nodes of the sample_column, or the sample_values. The sample is then
+    propagated one hop: the nodes linked to a seed node by an entity to entity edge query are sampled as well.
+    The conversion is then run on the subgraph induced by the sampled nodes (see sample_unit &
+    filter_sampled_results), so every edge is at most one hop away from a seed node
+    :param entity_types, edge_types: Node types of the columns of every query (see query_node_types)
+    :param options: Optional settings (see DEFAULT_OPTIONS), the sample_* ones are used
+    :return sample: dict of node type -> array of the sampled tokens
+    """
+    table_name, col_name = options["sample_column"].split('.')
+    seed_type = table_name + '_' + col_name + '_'
+    if ([seed_type] not in entity_types):
+        print(f'Error: sample_column {options["sample_column"]} is not the column of an entity query')
+        exit(1)
+
+    if (options["sample_values"] is not None):
+        seeds = pd.unique(np.array([clean_token(value) for value in options["sample_values"]], dtype=object))
+        num_candidates = len(seeds)
+    else:
+        i = entity_types.index([seed_type])
+        tokens = [column_to_objects(result.iloc[:, 0]).astype(str) for j, result in
+            run_query_unit(cursor, ([(i, None)], entity_queries_list[i]), options)]
+        tokens = pd.unique(np.concatenate(tokens)) if (len(tokens) != 0) else np.array([], dtype=object)
+        seeds = tokens[sample_tokens(tokens, options["sample_fraction"], options["sample_seed"])]
+        num_candidates = len(tokens)
+    sample = {seed_type: seeds}
+
+    # the entity to entity edge queries starting or ending at a seed node only fetch the rows of the seed nodes
+    seed_types = [[node_type if (node_type == seed_type) else None for node_type in types] for types in edge_types]
+    reached = dict()
+    for i in range(len(edge_queries_list)):
+        if (edge_types[i][1] is None or seed_type not in edge_types[i]):
+            continue
+        unit = sample_unit(([(i, None)], edge_queries_list[i]), edge_queries_list[i], seed_types, sample, db_server,
+            cursor)
+        for j, result in filter_sampled_results(run_query_unit(cursor, unit, options), seed_types, sample):
+            for column, node_type in enumerate(edge_types[i]):
+                if (node_type != seed_type):
+                    reached.setdefault(node_type, list()).append(column_to_objects(result.iloc[:, column]).astype(str))
+    for node_type, tokens in reached.items():
+        sample[node_type] = pd.unique(np.concatenate(tokens))
+
+    print(f'Sample: {len(seeds)} of {num_candidates} {options["sample_column"]} seed nodes, '
+        f'{sum(len(tokens) for tokens in sample.values())} nodes of {len(sample)} types')
+    return sample
+
+def report_relation_counts(stats, rel_list):
+    """
+    Prints the number of queries, edges & unique dst nodes of every relation (see report_edge_counts)
+    """
+    relations = dict()
+    for i in range(len(rel_list)):
+        counts = relations.setdefault(rel_list[i], [0, 0, 0])
+        counts[0] += 1
+        counts[1] += stats[i]["edges"] if (i in stats) else 0
+        counts[2] += stats[i]["unique_dst"] if (i in stats) else 0
+    print('Relations: queries, edges, unique dst nodes (summed over the queries)')
+    for rel, (num_queries, num_edges, num_uniq) in relations.items():
+        print(f'  {rel}: {num_queries}, {num_edges}, {num_uniq}')
+
+# Database connection of the current worker thread/process (see create_query_executor)
+worker_state = threading.local()
+
+def init_query_worker(db_server, db_name, pool=None, options=DEFAULT_OPTIONS):
+    worker_state.cnx, worker_state.cursor = connect_to_db(db_server, db_name, pool, options)
+
+def run_query_unit_task(unit, options=DEFAULT_OPTIONS, cache_key=None, results=None, cancelled=None):
+    """
+    Runs a unit of work in a worker and puts its (query index, cleaned batch) pairs in the results queue as
+    they are produced, followed by None once the unit is done (or has failed). The worker stops as soon as
+    the cancelled event is set (see QueryExecutor.cancel)
+    :return stats: Statistics of the queries of the unit (see run_query_unit)
+    """
+    stats = dict()
+    try:
+        for pair in run_query_unit(worker_state.cursor, unit, options, cache_key, stats):
+            if (not put_unit_result(results, pair, cancelled)):
+                return stats
+    finally:
+        put_unit_result(results, None, cancelled)
+    return stats
+
+def put_unit_result(results, item, cancelled):
+    """
+    Puts the item in the results queue, waiting for room until the cancelled event is set or the main thread
+    has exited (e.g. on an error, the worker threads would otherwise keep the interpreter from exiting)
+    :return put: False if the run was cancelled before there was room for the item
+    """
+    while (not cancelled.is_set() and threading.main_thread().is_alive()):
+        try:
+            results.put(item, timeout=PROGRESS_SECONDS)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+class QueryExecutor:
+    """
+    Pool of workers running the units of work of all the execute_query_units calls of a run. The units are
+    submitted in the order of the calls (all the units of the first call, then the ones of the second ...),
+    which must be the order the results are consumed in. At most 2 * num_workers units are submitted and
+    not fully consumed at a time, across all the calls, and every unit streams its batches to the main
+    thread through a queue of at most UNIT_QUEUE_BATCHES batches, so a worker waits for its batches to be
+    consumed instead of holding the whole result of its unit
+    """
+    def __init__(self, executor, num_workers, worker_type):
+        self.executor = executor
+        self.max_in_flight = 2 * num_workers
+        self.num_in_flight = 0
+        self.pending = deque()  # tasks not submitted yet
+        # the queues of the worker processes are served by a manager process
+        self.manager = multiprocessing.Manager() if (worker_type == "processes") else None
+        self.cancelled = threading.Event() if (self.manager is None) else self.manager.Event()
+
+    def add(self, units, options=DEFAULT_OPTIONS):
+        """
+        Queues the units for execution
+        :param units: List of (unit of work, cache key) pairs
+        :return tasks: The tasks of the units, to be read with results() in the same order
+        """
+        tasks = [{"unit": unit, "cache_key": cache_key, "options": options, "future": None}
+            for unit, cache_key in units]
+        self.pending.extend(tasks)
+        self.submit()
+        return tasks
+
+    def submit(self):
+        while (self.num_in_flight < self.max_in_flight and len(self.pending) != 0):
+            self.submit_next()
+
+    def submit_next(self):
+        task = self.pending.popleft()
+        task["results"] = queue.Queue(UNIT_QUEUE_BATCHES) if (self.manager is None) \
+            else self.manager.Queue(UNIT_QUEUE_BATCHES)
+        task["future"] = self.executor.submit(run_query_unit_task, task["unit"], task["options"], task["cache_key"],
+            task["results"], self.cancelled)
+        self.num_in_flight += 1
+
+    def results(self, task, stats=None):
+        """
+        Yields the (query index, cleaned batch) pairs of a task as the worker produces them
+        :param stats: dict of query index -> statistics, updated with the ones of the unit once it is done
+        """
+        while (task["future"] is None):  # only when the results are not consumed in order
+            self.submit_next()
+        try:
+            while True:
+                try:
+                    pair = task["results"].get(timeout=PROGRESS_SECONDS)
+                except queue.Empty:
+                    if (task["future"].done()):
+                        break  # the worker died without finishing the unit, result() raises its error
+                    continue
+                if (pair is None):
+                    break
+                yield pair
+            unit_stats = task["future"].result()
+        except BaseException:
+            self.cancel()  # e.g. a failed query, or the results are no longer consumed
+            raise
+        self.num_in_flight -= 1
+        self.submit()
+        if (stats is not None):
+            for i in unit_stats:
+                merge_query_stats(stats[i], unit_stats[i])
+
+    def cancel(self):
+        """
+        Stops the workers waiting for their results to be consumed and drops the units not submitted yet
+        """
+        self.pending.clear()
+        self.cancelled.set()
+
+    def shutdown(self):
+        self.cancel()
+        self.executor.shutdown()
+        if (self.manager is not None):
+            self.manager.shutdown()
+
+def create_query_executor(db_server, db_name, num_workers, worker_type, options=DEFAULT_OPTIONS):
+    """
+    Creates the pool of workers used to run the queries concurrently. Threads take their connections
+    from a connection pool (when the driver has one), processes open a connection each
+    :param num_workers: Number of workers (and database connections)
+    :param worker_type: threads or processes
+    :param options: Optional settings (see DEFAULT_OPTIONS), the db_* credentials are used
+    :return executor: QueryExecutor, None if num_workers is 1 (everything runs serially)
+    """
+    if (num_workers <= 1):
+        return None
+    if (worker_type == "threads"):
+        pool = create_connection_pool(db_server, db_name, num_workers, options)
+        executor = ThreadPoolExecutor(num_workers, initializer=init_query_worker,
+            initargs=(db_server, db_name, pool, options))
+    elif (worker_type == "processes"):
+        executor = ProcessPoolExecutor(num_workers, initializer=init_query_worker,
+            initargs=(db_server, db_name, None, options))
+    else:
+        print("Error: worker_type should be threads or processes")
+        exit(1)
+    return QueryExecutor(executor, num_workers, worker_type)
+
+def execute_query_units(cursor, units, options=DEFAULT_OPTIONS, executor=None, cache_keys=None, stats=None):
+    """
+    Runs the units of work and returns a generator of their (query index, cleaned batch) pairs, in the order
+    of the units so the output is the same as a serial run whatever the number of workers.
+    With an executor, the units are queued right away and run as the results of the earlier units (of this
+    and of the earlier calls) are consumed, see QueryExecutor for the bounds on the results buffered
+    :param cursor: Cursor used when there is no executor, the units then run lazily one after another
+    :param units: List of units of work to run (see plan_shared_scans & single_query_units)
+    :param options: Optional settings (see DEFAULT_OPTIONS)
+    :param executor: QueryExecutor returned by create_query_executor
+    :param cache_keys: Cache key of every unit (see query_cache_key), None when there is no cache
+    :param stats: dict filled with the statistics of every query (see new_query_stats) as they are run
+    """
+    if (stats is None):
+        stats = dict()
+    for u, (members, query) in enumerate(units):
+        for i, projections in members:
+            stats[i] = new_query_stats(u, len(members) > 1 or projections is not None)
+
+    units = list(zip(units, cache_keys if (cache_keys is not None) else [None] * len(units)))
+    if (executor is None):
+        return (pair for unit, cache_key in units for pair in run_query_unit(cursor, unit, options, cache_key, stats))
+
+    tasks = executor.add(units, options)
+    return (pair for task in tasks for pair in executor.results(task, stats))
+
+# Run instrumentation
+def current_rss():
+    """
+    Resident memory of the process in bytes (from /proc on linux, else the peak of the process so far)
+    """
+    try:
+        with open("/proc/self/statm", 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class MemorySampler(threading.Thread):
+    """
+    Samples the resident memory of the process every MEMORY_SAMPLING_SECONDS in the background, to get the
+    peak memory of a stage (including the memory of numpy & arrow, which tracemalloc would miss)
+    """
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.peak = 0
+        self.stopped = threading.Event()
+
+    def reset(self):
+        self.peak = current_rss()
+
+    def run(self):
+        while (not self.stopped.wait(MEMORY_SAMPLING_SECONDS)):
+            self.peak = max(self.peak, current_rss())
+
+    def stop(self):
+        self.stopped.set()
+
+def new_query_stats(unit=None, shared_scan=False):
+    """
+    Statistics of a query, filled by run_query_unit & post_processing:
+    - unit, shared_scan: Unit of work running the query (see plan_shared_scans), shared with other queries or not
+    - cached: The result was read from the cache_dir
+    - fetch_seconds, clean_seconds, filter_seconds: Time spent fetching the rows, cleaning the tokens &
+      dropping the invalid & duplicate rows
+    - rows_fetched, rows_invalid, rows_duplicate, rows: Rows returned by the query, dropped by the invalid
+      entry filter, dropped as duplicates & kept
+    - peak_rss_mb: Peak resident memory of the process running the query, sampled between batches
+    - edges, unique_dst, unmapped_endpoints: For the edge queries, edges written, unique dst values &
+      endpoints missing from the node mapping
+    """
+    return {"unit": unit, "shared_scan": shared_scan, "cached": False, "fetch_seconds": 0.0, "clean_seconds": 0.0,
+        "filter_seconds": 0.0, "rows_fetched": 0, "rows_invalid": 0, "rows_duplicate": 0, "rows": 0, "peak_rss_mb": 0.0}
+
+def merge_query_stats(stats, other):
+    """
+    Adds the statistics of a query gathered by another worker to stats
+    """
+    for key, value in other.items():
+        if (key in ("unit", "shared_scan")):
+            continue
+        elif (key == "cached"):
+            stats[key] = stats[key] or value
+        elif (key == "peak_rss_mb"):
+            stats[key] = max(stats[key], value)
+        else:
+            stats[key] = stats.get(key, 0) + value
+
+class ProgressLineOutput:
+    """
+    Stands for sys.stdout once a progress line is shown (see RunProfiler.show_progress): the progress line is
+    ended before anything is printed, instead of the print continuing it
+    """
+    def __init__(self, stream, profiler):
+        self.stream = stream
+        self.profiler = profiler
+
+    def write(self, text):
+        if (len(text) != 0):
+            self.profiler.end_progress_line()
+        return self.stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+class RunProfiler:
+    """
+    Records the wall time & peak memory of every stage of the pipeline and the statistics of every query
+    (see new_query_stats), written to a run report at the end (see write). With progress, a live progress
+    line with the rows processed so far is shown on stderr
+    """
+    def __init__(self, progress=False):
+        self.started = time.time()
+        self.start = time.perf_counter()
+        self.progress = progress
+        self.stages = dict()
+        self.entity_stats = dict()
+        self.edge_stats = dict()
+        self.stage_name = None
+        self.stage_rows = 0
+        self.last_progress = 0.0
+        self.progress_line = False  # a progress line is shown & not ended yet
+        self.sampler = MemorySampler()
+        self.sampler.reset()
+        self.sampler.start()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        self.stage_name = name
+        self.stage_rows = 0
+        self.sampler.reset()
+        start = time.perf_counter()
+        yield
+        self.stages[name] = {"seconds": time.perf_counter() - start,
+            "peak_rss_mb": max(self.sampler.peak, current_rss()) / (1 << 20)}
+        if (self.progress and self.last_progress != 0.0):
+            self.show_progress(None, 0, force=True)
+            self.end_progress_line()
+            self.last_progress = 0.0
+
+    def track(self, query_results, num_queries):
+        """
+        Passes the (query index, batch) pairs through, updating the progress line
+        """
+        for i, result in query_results:
+            self.stage_rows += len(result)
+            if (self.progress):
+                self.show_progress(i, num_queries)
+            yield i, result
+
+    def show_progress(self, i, num_queries, force=False):
+        now = time.perf_counter()
+        if (force or now - self.last_progress >= PROGRESS_SECONDS):
+            query = f'query {i + 1}/{num_queries}, ' if (i is not None) else ''
+            if (not isinstance(sys.stdout, ProgressLineOutput)):
+                sys.stdout = ProgressLineOutput(sys.stdout, self)
+            sys.stderr.write(f'\r{self.stage_name}: {query}{self.stage_rows} rows, {now - self.start:.1f}s, '
+                f'{current_rss() >> 20} MB  ')
+            sys.stderr.flush()
+            self.progress_line = True
+            self.last_progress = now
+
+    def end_progress_line(self):
+        """
+        Ends the progress line on stderr (if one is shown), so the next output starts on a line of its own
+        """
+        if (self.progress_line):
+            self.progress_line = False
+            sys.stderr.write('\n')
+            sys.stderr.flush()
+
+    def stop(self):
+        """
+        Stops the memory sampling & ends the progress line
+        """
+        self.sampler.stop()
+        self.end_progress_line()
+        if (isinstance(sys.stdout, ProgressLineOutput)):
+            sys.stdout = sys.stdout.stream
+
+    def write(self, path, entity_queries_list, edge_queries_list, rel_list, info=None):
+        """
+        Writes the run report: a JSON file with the stages & the statistics of every query, or with a .csv path
+        a table with one row per stage & query. The slowest queries are printed
+        :param info: dict of other information on the run (database, options, ...)
+        """
+        self.sampler.stop()
+        queries = list()
+        for kind, queries_list, stats in (("entity", entity_queries_list, self.entity_stats),
+            ("edge", edge_queries_list, self.edge_stats)):
+            for i in range(len(queries_list)):
+                query_stats = stats.get(i, new_query_stats())
+                seconds = query_stats["fetch_seconds"] + query_stats["clean_seconds"] + query_stats["filter_seconds"]
+                queries.append(dict({"kind": kind, "query": i, "relation": rel_list[i] if (kind == "edge") else None,
+                    "seconds": seconds}, **query_stats, sql=queries_list[i]))
+
+        if (Path(path).suffix == ".csv"):
+            rows = [dict({"kind": "stage", "query": name}, **stage) for name, stage in self.stages.items()]
+            pd.DataFrame(rows + queries).to_csv(path, index=False)
+        else:
+            report = {"run": dict(info if (info is not None) else dict(), started=time.strftime(
+                "%Y-%m-%dT%H:%M:%S", time.localtime(self.started)), seconds=time.perf_counter() - self.start),
+                "stages": self.stages, "queries": queries}
+            with open(path, 'w') as file:
+                json.dump(report, file, indent=2, default=str)
+
+        print(f'Run report written to {path}, slowest queries:')
+        for query in sorted(queries, key=lambda query: query["seconds"], reverse=True)[:5]:
+            print(f'  {query["seconds"]:.3f}s {query["kind"]} query {query["query"]}: {query["rows_fetched"]} rows '
+                f'fetched, {query["rows_invalid"]} invalid, {query["rows_duplicate"]} duplicates')
 
 # Clean-up and Output
-def post_processing(cursor, edge_entity_entity_queries_list, edge_entity_entity_rel_list, 
-    edge_entity_feature_val_queries_list, edge_entity_feature_val_rel_list, entity_mapping):
+def post_processing(query_results, edge_entity_entity_queries_list, edge_entity_entity_rel_list, 
+    edge_entity_feature_val_queries_list, edge_entity_feature_val_rel_list, entity_mapping, options=DEFAULT_OPTIONS,
+    rel_mapping=None, stats=None):
     """
-    Executes the given queries_list one by one, cleanses the data by removing duplicates,
-    then replace the entity nodes with their respective UUIDs, and store the final result in a dataframe/.txt file
+    Takes the results of the edge queries (see execute_query_units), cleansed & without duplicates,
+    then replace the entity nodes, relations & feature values with their respective integer ids,
+    and store the final result in a dataframe & in the output files (see create_edge_writer) along with
+    the node & relation id mappings
+    Note: feature values are added to entity_mapping as new nodes, after all the entity nodes
+    :param query_results: (query index, cleaned batch) pairs, the index is the position of the query in
+        edge_entity_entity_queries_list + edge_entity_feature_val_queries_list
+    :param options: Optional settings (see DEFAULT_OPTIONS). With a batch_size, every batch is remapped
+        & appended to the output files as it arrives and nothing is returned
+    :param rel_mapping: Existing relation ids to keep (e.g. from load_id_store), new relations get the next ids
+    :param stats: dict of query index -> statistics (see new_query_stats), completed with the number of edges,
+        unique dst nodes & unmapped endpoints of every query
+    Note: the entity to feature value relations of the node_features option are written as node feature
+        matrices (see write_node_features) instead of edges, and have no relation id
     """
     if (len(edge_entity_entity_queries_list) != len(edge_entity_entity_rel_list)):
         print("wrong list")
@@ -328,107 +2459,323 @@ def post_processing(cursor, edge_entity_entity_queries_list, edge_entity_entity_
         print("wrong list")
         exit(1)
 
-    src_rel_dst = pd.DataFrame()
+    num_entity_entity = len(edge_entity_entity_queries_list)
+    rel_list = edge_entity_entity_rel_list + edge_entity_feature_val_rel_list
+    node_features = options["node_features"] if (options["node_features"] is not None) else dict()
+    feature_values = {rel: list() for rel in node_features}  # rel -> list of (src ids, feature values)
+    if (rel_mapping is None):
+        rel_mapping = build_id_mapping([])
+    rel_mapping = extend_id_mapping(rel_mapping, [rel for rel in rel_list if (rel not in node_features)])
+    batch_size = options["batch_size"]
+    writer = create_edge_writer(options)
+    src_rel_dst = list()
+    src_prefix_list, dst_prefix_list = edge_prefixes(
+        edge_entity_entity_queries_list + edge_entity_feature_val_queries_list, num_entity_entity)
 
-    # These are just for metrics
+    # These are just for metrics, the unique dst values are counted by their 64 bit hash
+    uniq_dst = [SortedRuns() for i in range(len(rel_list))]
     num_uniq = []  # number of entities
-    num_edge_type = []  # number of edges
-    none_count = 0 # For debugging
-
-    # edges from entity node to entity node processing
-    for i in range(len(edge_entity_entity_queries_list)):
-        query = edge_entity_entity_queries_list[i]
-        cursor.execute(query)
-        result = pd.DataFrame(cursor)
-        result.columns = cursor.column_names
-
-        # TODO: Table Name splitting needs to be more robust - right now we are assuming that position 1 and 2
-        # will always be src and dst. Is that a correct assumption in our paradigm think?
-        table_name_list = re.split(' ', query)  # table name of the query to execute
-        table_name1 = table_name_list[1].split('.')[0] # src table
-        col_name1 = table_name_list[1].split('.')[1][:-1] # src column, (note last character ',' is removed)
-        table_name2 = table_name_list[2].split('.')[0] # dst/target table
-        col_name2 = table_name_list[2].split('.')[1] # dst/target column
-
-        # Cleaning Part
-        result = result.applymap(clean_token)  # strip tokens and lower case strings
-        result = result[~result.iloc[:, 1].isin(INVALID_ENTRY_LIST)]  # clean invalid data
-        result = result[~result.iloc[:, 0].isin(INVALID_ENTRY_LIST)]
-        result = result.drop_duplicates()  # remove invalid row
-
-        result.iloc[:, 0] = table_name1 + "_" + col_name1 + '_' + result.iloc[:, 0]   # src
-        result.iloc[:, 1] = table_name2 + "_" + col_name2 + '_' + result.iloc[:, 1] # dst/target
-        result.insert(1, "rel", edge_entity_entity_rel_list[i])  # rel
-        result.columns = ["src", "rel", "dst"]
-        num_uniq.append(len(result.iloc[:, 2].unique()))
-        num_edge_type.append(result.shape[0])
-        # print(f'result\n{result}')
-
-        # convert entity nodes to respective UUIDs
-        for index, row in result.iterrows():
-            # gets the UUID for the specific entity node from the entity_mapping
-            result.at[index, 'src'] = entity_mapping.get(result.at[index, 'src'])
-            result.at[index, 'dst'] = entity_mapping.get(result.at[index, 'dst'])
-
-            # if (result.at[index, 'src'] is None):
-            #     print("None: returned by entity_mapping src at query (entity-entity edges) position "
-            #         + str(i)+" and result index " + str(index))
-            #     none_count = none_count+1
-            #
-            # if (result.at[index, 'dst'] is None):
-            #     print("None: returned by entity_mapping dst at query (entity-entity edges) position "
-            #         + str(i)+" and result index " + str(index))
-            #     none_count = none_count+1
-
-        src_rel_dst = pd.concat([src_rel_dst, result])
-    
-    # edges from entity node to feature values processing
-    # Note: feature values will not have table_name and col_name appended
-    # TODO: Test Feature values part of post processing
-    for i in range(len(edge_entity_feature_val_queries_list)):
-        query = edge_entity_feature_val_queries_list[i]
-        cursor.execute(query)
-        result = pd.DataFrame(cursor)
-        result.columns = cursor.column_names
-
-        # TODO: Table Name splitting needs to be more robust - right now we are assuming that position 1 and 2
-        # will always be src and dst. Is that a correct assumption in our paradigm think?
-        table_name_list = re.split(' ', query)  # table name of the query to execute
-        table_name1 = table_name_list[1].split('.')[0] # src table
-        col_name1 = table_name_list[1].split('.')[1][:-1] # src column, (note last character ',' is removed)
+    num_edge_type = [0] * len(rel_list)  # number of edges
+    none_count = [0] * len(rel_list) # For debugging
 
-        # Cleaning Part
-        result = result.applymap(clean_token)  # strip tokens and lower case strings
-        result = result[~result.iloc[:, 1].isin(INVALID_ENTRY_LIST)]  # clean invalid data
-        result = result[~result.iloc[:, 0].isin(INVALID_ENTRY_LIST)]
-        result = result.drop_duplicates()  # remove invalid row
-
-        result.iloc[:, 0] = table_name1 + "_" + col_name1 + '_' + result.iloc[:, 0]   # src
-        result.insert(1, "rel", edge_entity_feature_val_rel_list[i])  # rel
-        result.columns = ["src", "rel", "dst"]
-        num_uniq.append(len(result.iloc[:, 2].unique()))
-        num_edge_type.append(result.shape[0])
-        # print(f'result\n{result}')
-
-        # convert entity nodes to respective UUIDs
-        for index, row in result.iterrows():
-            # gets the UUID for the specific entity node from the entity_mapping
-            result.at[index, 'src'] = entity_mapping.get(result.at[index, 'src'])
-            
-            # if (result.at[index, 'src'] is None):
-            #     print("None: returned by entity_mapping src at query (entity-feature edges) position "
-            #         + str(i)+" and result index " + str(index))
-            #     none_count = none_count+1
+    entity_mapping = GrowingIdMapping(entity_mapping)
+    for i, result in query_results:
+        uniq_dst[i].add(pd.util.hash_array(pd.unique(column_to_objects(result.iloc[:, 1]))))
+
+        if (i >= num_entity_entity and rel_list[i] in node_features):
+            # feature values of the nodes, kept aside until all the node ids are known
+            src = entity_mapping.lookup(src_prefix_list[i] + result.iloc[:, 0])
+            none_count[i] += int(src.isna().sum())
+            feature_values[rel_list[i]].append((src, result.iloc[:, 1]))
+            continue
+        num_edge_type[i] += result.shape[0]
+
+        if (i < num_entity_entity):
+            # edges from entity node to entity node, one vectorized join per column
+            src = entity_mapping.lookup(src_prefix_list[i] + result.iloc[:, 0])
+            dst = entity_mapping.lookup(dst_prefix_list[i] + result.iloc[:, 1])
+            none_count[i] += int(src.isna().sum()) + int(dst.isna().sum())
+        else:
+            # edges from entity node to feature values, feature values become new nodes
+            # Note: feature values will not have table_name and col_name appended
+            # TODO: Test Feature values part of post processing
+            src = entity_mapping.lookup(src_prefix_list[i] + result.iloc[:, 0])
+            entity_mapping.extend(result.iloc[:, 1])
+            dst = entity_mapping.lookup(result.iloc[:, 1])
+            none_count[i] += int(src.isna().sum())
+
+        rel = np.full(len(result), rel_mapping[rel_list[i]], dtype=np.int64)
+        result = pd.DataFrame({"src": src, "rel": rel, "dst": dst})
+        writer.write(result)
+        if (batch_size is None):
+            src_rel_dst.append(result)
+
+    num_uniq = [len(uniq) for uniq in uniq_dst]
+    entity_mapping = entity_mapping.to_series()
+    writer.close(entity_mapping, rel_mapping)
+    for rel, pairs in feature_values.items():
+        pairs = pairs + [(pd.array([], dtype='Int64'), pd.Series([], dtype=object))]
+        src = pd.concat([pd.Series(src, dtype='Int64') for src, values in pairs], ignore_index=True)
+        values = pd.concat([pd.Series(column_to_objects(values), dtype=object) for src, values in pairs],
+            ignore_index=True)
+        num_columns, num_nodes = write_node_features(node_features_dir(options), rel, src, values, node_features[rel],
+            len(entity_mapping), options["feature_buckets"])
+        print(f'Node features {rel}: {node_features[rel]}, {num_columns} columns, {num_nodes} nodes with a value')
+    report_edge_counts(stats, num_edge_type, num_uniq, none_count, len(entity_mapping), len(rel_mapping))
+
+    if (batch_size is not None):
+        return None  # streaming mode, the edges are only in the output file
 
-        src_rel_dst = pd.concat([src_rel_dst, result])
+    src_rel_dst = pd.concat(src_rel_dst, ignore_index=True) if (len(src_rel_dst) != 0) \
+        else pd.DataFrame({"src": pd.array([], dtype='Int64'), "rel": pd.array([], dtype='Int64'), 
+            "dst": pd.array([], dtype='Int64')})
+    return src_rel_dst  # returns a dataframe with integer ids, ready for Marius
 
-    # print(f'None Count is {none_count}. If not 0 there is some issue as entity mapping does not have some entities')
-    print(f'src_rel_dst\n{src_rel_dst}\n')
-    src_rel_dst.to_csv(output_dir / Path("all_edges(t2g).txt"), sep='\t', header=False, index=False)  # write to txt
-    return src_rel_dst  # returns a dataframe or whatever format Marius wants
+def report_edge_counts(stats, num_edge_type, num_uniq, none_count, num_nodes, num_relations):
+    """
+    Adds the number of edges, unique dst nodes & unmapped endpoints of every edge query to its statistics
+    (see new_query_stats) and prints the totals
+    """
+    if (stats is not None):
+        for i in range(len(num_edge_type)):
+            stats.setdefault(i, new_query_stats())
+            stats[i].update({"edges": int(num_edge_type[i]), "unique_dst": int(num_uniq[i]),
+                "unmapped_endpoints": int(none_count[i])})
+    print(f'{int(sum(num_edge_type))} edges of {num_relations} relations between {num_nodes} nodes')
+    if (sum(none_count) != 0):
+        print(f'None Count is {int(sum(none_count))}. If not 0 there is some issue as entity mapping does not have '
+            'some entities')
+
+# Out-of-core node mapping & deduplication
+def hash_partitions(values, num_partitions):
+    """
+    Returns the hash partition (0 to num_partitions - 1) of every value, the same in every run
+    """
+    hashes = pd.util.hash_pandas_object(pd.Series(values, dtype=object), index=False).to_numpy()
+    return (hashes % np.uint64(num_partitions)).astype(np.int64)
+
+def read_spill_file(path):
+    """
+    Yields the dataframes appended to a spill file (see SpillFiles), in the order they were written
+    """
+    with open(path, 'rb') as file:
+        while True:
+            try:
+                yield pickle.load(file)
+            except EOFError:
+                break
+
+class SpillFiles:
+    """
+    Hash partitions the rows of dataframes by one of their columns to num_partitions spill files. Rows are
+    buffered per partition and appended to the files as pickled dataframes once buffer_bytes are buffered
+    """
+    def __init__(self, directory, name, num_partitions, buffer_bytes):
+        self.paths = [Path(directory) / Path(f'{name}_{p}.pkl') for p in range(num_partitions)]
+        self.files = [open(path, 'wb') for path in self.paths]
+        self.buffers = [list() for p in range(num_partitions)]
+        self.buffer_bytes = buffer_bytes
+        self.buffered_bytes = 0
+
+    def write(self, frame, key_column):
+        partitions = hash_partitions(frame[key_column], len(self.paths))
+        order = np.argsort(partitions, kind='stable')
+        bounds = np.searchsorted(partitions[order], np.arange(len(self.paths) + 1))
+        for p in np.flatnonzero(bounds[1:] != bounds[:-1]):
+            self.buffers[p].append(frame.iloc[order[bounds[p]:bounds[p + 1]]])
+        self.buffered_bytes += int(frame.memory_usage(index=False, deep=True).sum())
+        if (self.buffered_bytes >= self.buffer_bytes):
+            self.flush()
+
+    def flush(self):
+        for p in range(len(self.files)):
+            if (len(self.buffers[p]) != 0):
+                pickle.dump(pd.concat(self.buffers[p], ignore_index=True), self.files[p],
+                    protocol=pickle.HIGHEST_PROTOCOL)
+                self.buffers[p] = list()
+        self.buffered_bytes = 0
+
+    def close(self):
+        """
+        :return paths: Path of the spill file of every partition
+        """
+        self.flush()
+        for file in self.files:
+            file.close()
+        return self.paths
+
+class SpilledIdMapping:
+    """
+    Node id mapping of the out-of-core mode, kept on disk as one deduplicated node file per partition.
+    The entity nodes get the first ids, partition after partition, then the feature values do the same.
+    It has the len & to_csv of the mapping Series (see build_id_mapping) used by the edge writers
+    """
+    def __init__(self, paths, num_entities, num_features):
+        self.paths = paths
+        self.entity_offsets = np.concatenate([[0], np.cumsum(num_entities)]).astype(np.int64)
+        self.feature_offsets = self.entity_offsets[-1] + np.concatenate([[0], np.cumsum(num_features)]).astype(np.int64)
+
+    def __len__(self):
+        return int(self.feature_offsets[-1])
+
+    def partition(self, p):
+        """
+        Loads the mapping of the nodes of partition p, a Series like build_id_mapping, entity nodes first
+        """
+        names = pd.read_pickle(self.paths[p])["name"]
+        ids = np.concatenate([np.arange(self.entity_offsets[p], self.entity_offsets[p + 1]),
+            np.arange(self.feature_offsets[p], self.feature_offsets[p + 1])])
+        return pd.Series(ids, index=pd.Index(names, dtype=object), name='id')
+
+    def lookup(self, mapping, values):
+        """
+        Ids of the values in the mapping of a partition, -1 for the values missing in the mapping
+        """
+        positions = mapping.index.get_indexer(pd.Series(values, dtype=object))
+        return np.where(positions >= 0, mapping.to_numpy()[positions], -1)
+
+    def to_csv(self, path, sep='\t', header=False):
+        with open(path, 'w') as file:
+            for p in range(len(self.paths)):
+                num_entities = self.entity_offsets[p + 1] - self.entity_offsets[p]
+                self.partition(p).iloc[:num_entities].to_csv(file, sep=sep, header=header)
+            for p in range(len(self.paths)):
+                num_entities = self.entity_offsets[p + 1] - self.entity_offsets[p]
+                self.partition(p).iloc[num_entities:].to_csv(file, sep=sep, header=header)
+
+def dedup_spilled_nodes(node_paths, memory_budget):
+    """
+    Deduplicates the node spill files in place, keeping the entity nodes before the feature values
+    :return (num_entities, num_features): Number of unique entity nodes & feature values of every partition
+    """
+    num_entities = np.zeros(len(node_paths), dtype=np.int64)
+    num_features = np.zeros(len(node_paths), dtype=np.int64)
+    for p, path in enumerate(node_paths):
+        nodes = pd.concat([pd.DataFrame({"name": pd.Series([], dtype=object), "kind": pd.Series([], dtype=np.int8)})]
+            + list(read_spill_file(path)), ignore_index=True)
+        if (nodes.memory_usage(index=False, deep=True).sum() > memory_budget):
+            print(f'Warning: node partition {p} is larger than memory_budget_mb, increase spill_partitions')
+        # entity nodes are spilled before any feature value, so a name keeps its entity kind
+        nodes = nodes.drop_duplicates("name")
+        nodes = pd.concat([nodes[nodes["kind"] == 0], nodes[nodes["kind"] == 1]], ignore_index=True)
+        nodes.to_pickle(path)
+        num_entities[p] = int((nodes["kind"] == 0).sum())
+        num_features[p] = len(nodes) - num_entities[p]
+    return num_entities, num_features
+
+def external_post_processing(entity_results, edge_results, entity_queries_list, edge_entity_entity_queries_list,
+    edge_entity_entity_rel_list, edge_entity_feature_val_queries_list, edge_entity_feature_val_rel_list,
+    options=DEFAULT_OPTIONS, stats=None):
+    """
+    Out-of-core version of entity_node_to_uuids & post_processing, for graphs whose nodes & edges do not fit
+    in memory. Nodes & edges are hash partitioned to spill files in the spill_dir, then every partition is
+    deduplicated & id mapped on its own:
+    1. the node names are partitioned by name, the edges (src name, query, dst name) by src name
+    2. every node partition is deduplicated and given its ids (see SpilledIdMapping)
+    3. the duplicate edges of every edge partition are dropped, its src is mapped with the same node partition,
+       then the edges are partitioned again by dst name
+    4. the dst of every edge partition is mapped & the edges are written
+    Only one partition & the spill buffers are held in memory at a time: spill_partitions is to be chosen so
+    that a partition fits in memory_budget_mb, and the batch_size should be set
+    Note: the node ids are grouped by partition rather than in the order the nodes are first seen
+    :param entity_results: (query index, cleaned batch) pairs of the entity queries
+    :param edge_results: (query index, cleaned batch) pairs of the edge queries (see post_processing)
+    :param options: Optional settings (see DEFAULT_OPTIONS)
+    :param stats: dict of query index -> statistics of the edge queries (see post_processing)
+    """
+    spill_dir = Path(options["spill_dir"])
+    spill_dir.mkdir(parents=True, exist_ok=True)
+    num_partitions = options["spill_partitions"]
+    memory_budget = options["memory_budget_mb"] << 20
+    num_entity_entity = len(edge_entity_entity_queries_list)
+    rel_list = edge_entity_entity_rel_list + edge_entity_feature_val_rel_list
+    rel_mapping = build_id_mapping(rel_list)
+    rel_ids = rel_mapping[rel_list].to_numpy()
+    entity_prefix_list = entity_prefixes(entity_queries_list)
+    src_prefix_list, dst_prefix_list = edge_prefixes(
+        edge_entity_entity_queries_list + edge_entity_feature_val_queries_list, num_entity_entity)
+
+    # 1. spill the entity nodes, the feature values & the edges
+    node_spill = SpillFiles(spill_dir, "nodes", num_partitions, memory_budget // 4)
+    for i, result in entity_results:
+        entity_nodes = (entity_prefix_list[i] + result.iloc[:, 0].map(str)).str.lower()
+        node_spill.write(pd.DataFrame({"name": entity_nodes, "kind": np.int8(0)}), "name")
+    edge_spill = SpillFiles(spill_dir, "edges", num_partitions, memory_budget // 4)
+    for i, result in edge_results:
+        src = src_prefix_list[i] + result.iloc[:, 0]
+        if (i < num_entity_entity):
+            dst = dst_prefix_list[i] + result.iloc[:, 1]
+        else:
+            # feature values become new nodes, without table_name and col_name
+            dst = result.iloc[:, 1]
+            node_spill.write(pd.DataFrame({"name": dst, "kind": np.int8(1)}), "name")
+        edge_spill.write(pd.DataFrame({"src": src.to_numpy(), "query": np.int32(i), "dst": dst.to_numpy()}), "src")
+    node_paths = node_spill.close()
+    edge_paths = edge_spill.close()
+
+    # 2. deduplicate & map every node partition
+    num_entities, num_features = dedup_spilled_nodes(node_paths, memory_budget)
+    node_mapping = SpilledIdMapping(node_paths, num_entities, num_features)
+
+    # 3. drop the duplicate edges (all the copies of an edge are in the partition of its src name), map their src,
+    # partition by dst
+    dst_spill = SpillFiles(spill_dir, "edges_by_dst", num_partitions, memory_budget // 4)
+    num_duplicate = np.zeros(len(rel_list), dtype=np.int64)
+    for p in range(num_partitions):
+        mapping = node_mapping.partition(p)
+        edges = pd.concat([pd.DataFrame({"src": pd.Series([], dtype=object), "query": pd.Series([], dtype=np.int32),
+            "dst": pd.Series([], dtype=object)})] + list(read_spill_file(edge_paths[p])), ignore_index=True)
+        edge_paths[p].unlink()
+        num_duplicate += np.bincount(edges["query"], minlength=len(rel_list))
+        edges = edges.drop_duplicates(ignore_index=True)
+        num_duplicate -= np.bincount(edges["query"], minlength=len(rel_list))
+        edges["src"] = node_mapping.lookup(mapping, edges["src"])
+        dst_spill.write(edges, "dst")
+    dst_paths = dst_spill.close()
+
+    # 4. map the dst of the edges & write them
+    writer = create_edge_writer(options)
+    uniq_dst = np.zeros(len(rel_list), dtype=np.int64)
+    num_edge_type = np.zeros(len(rel_list), dtype=np.int64)
+    none_count = np.zeros(len(rel_list), dtype=np.int64)
+    for p in range(num_partitions):
+        mapping = node_mapping.partition(p)
+        edges = pd.concat([pd.DataFrame({"src": pd.Series([], dtype=np.int64), "query": pd.Series([], dtype=np.int32),
+            "dst": pd.Series([], dtype=object)})] + list(read_spill_file(dst_paths[p])), ignore_index=True)
+        dst_paths[p].unlink()
+        # dst nodes of a query all land in the partition of their name, so the counts add up over the partitions
+        uniq_dst += np.bincount(edges[["query", "dst"]].drop_duplicates()["query"], minlength=len(rel_list))
+        edges["dst"] = node_mapping.lookup(mapping, edges["dst"]).astype(np.int64)
+        none_count += np.bincount(edges["query"], weights=(edges["src"] < 0).to_numpy().astype(np.int64)
+            + (edges["dst"] < 0).to_numpy(), minlength=len(rel_list)).astype(np.int64)
+        num_edge_type += np.bincount(edges["query"], minlength=len(rel_list))
+
+        src = pd.array(edges["src"].to_numpy(), dtype='Int64')
+        dst = pd.array(edges["dst"].to_numpy(), dtype='Int64')
+        src[edges["src"].to_numpy() < 0] = pd.NA
+        dst[edges["dst"].to_numpy() < 0] = pd.NA
+        writer.write(pd.DataFrame({"src": src, "rel": rel_ids[edges["query"].to_numpy()], "dst": dst}))
+
+    num_uniq = list(uniq_dst)
+    writer.close(node_mapping, rel_mapping)
+    for path in node_paths:
+        path.unlink()
+    # the duplicates across batches are only dropped here
+    if (stats is not None):
+        for i in range(len(rel_list)):
+            stats.setdefault(i, new_query_stats())
+            stats[i]["rows_duplicate"] += int(num_duplicate[i])
+            stats[i]["rows"] -= int(num_duplicate[i])
+    report_edge_counts(stats, num_edge_type, num_uniq, none_count, len(node_mapping), len(rel_mapping))
 
-def main():
-    ret_data = config_parser_fn("conf/config.yaml")
+def main(resume=False):
+    """
+    Runs the conversion configured in conf/config.yaml
+    :param resume: Resume the last run checkpointed to the checkpoint_dir (see start_checkpoint)
+    """
+    profiler = RunProfiler()
+    with profiler.stage("parsing"):
+        ret_data = config_parser_fn("conf/config.yaml")
     db_server = ret_data[0]
     db_name = ret_data[1]
     entity_queries_list = ret_data[2]
@@ -436,16 +2783,187 @@ def main():
     edge_entity_entity_rel_list = ret_data[4]
     edge_entity_feature_val_queries_list = ret_data[5]
     edge_entity_feature_val_rel_list = ret_data[6]
+    options = ret_data[7]
+    profiler.progress = options["progress"]
+
+    with profiler.stage("connection"):
+        # returning both cnx & cursor because cnx is main object deleting it leads to lose of cursor
+        cnx, cursor = connect_to_db(db_server, db_name, None, options)
+        executor = create_query_executor(db_server, db_name, options["num_workers"], options["worker_type"], options)
+
+    with profiler.stage("validation"):
+        entity_queries_list = validation_check_entity_queries(entity_queries_list)
+        edge_entity_entity_queries_list = validation_check_edge_entity_entity_queries(edge_entity_entity_queries_list)
+        edge_entity_feature_val_queries_list = validation_check_edge_entity_feature_val_queries(edge_entity_feature_val_queries_list)
+        if (options["shared_scans"]):
+            edge_units = plan_shared_scans(edge_entity_entity_queries_list + edge_entity_feature_val_queries_list)
+        else:
+            edge_units = single_query_units(edge_entity_entity_queries_list + edge_entity_feature_val_queries_list)
+
+        if (options["cleaning_engine"] == "arrow" and pa is None):
+            print("Error: cleaning_engine arrow needs the pyarrow package")
+            exit(1)
+        if (options["spill_dir"] is not None and options["id_store_dir"] is not None):
+            print("Error: id_store_dir is not supported by the out-of-core mode (spill_dir)")
+            exit(1)
+        if (options["sample_column"] is not None and options["id_store_dir"] is not None):
+            print("Error: id_store_dir is not supported by the sampled-graph mode (sample_column), a sampled run "
+                "would replace the stored edges with its own")
+            exit(1)
+        if (options["checkpoint_dir"] is not None and options["cache_dir"] is not None):
+            print("Error: checkpoint_dir is not needed with a cache_dir, the completed queries are already cached")
+            exit(1)
+        if (resume and options["checkpoint_dir"] is None):
+            print("Error: --resume needs a checkpoint_dir")
+            exit(1)
+        if (options["node_features"] is not None):
+            for rel, encoding in options["node_features"].items():
+                if (rel not in edge_entity_feature_val_rel_list):
+                    print(f'Error: node_features {rel} is not an entity to feature value relation')
+                    exit(1)
+                if (encoding not in FEATURE_ENCODINGS):
+                    print("Error: node_features encodings should be " + ', '.join(FEATURE_ENCODINGS))
+                    exit(1)
+            if (options["spill_dir"] is not None):
+                print("Error: node_features is not supported by the out-of-core mode (spill_dir)")
+                exit(1)
+        if (options["split_fractions"] is not None and (len(options["split_fractions"]) != len(SPLIT_NAMES)
+            or min(options["split_fractions"]) < 0 or sum(options["split_fractions"]) <= 0)):
+            print("Error: split_fractions should be the [train, validation, test] fractions of the edges")
+            exit(1)
+        if (options["temporary_indexes"] and not options["preflight"]):
+            print("Error: temporary_indexes needs preflight")
+            exit(1)
+
+        # entity & edge queries are submitted together so the edge queries run while the entity nodes are mapped
+        entity_units = single_query_units(entity_queries_list)
+        planned_units = entity_units + edge_units  # before the pushdown rewrite (see sample_unit)
+        if (options["pushdown_cleaning"]):
+            entity_units = [pushdown_cleaning_unit(unit, db_server, cursor) for unit in entity_units]
+            edge_units = [pushdown_cleaning_unit(unit, db_server, cursor) for unit in edge_units]
+
+    # before any data is pulled (the sampling runs queries of its own), the queries explained are the unsampled ones
+    temporary_indexes = list()
+    if (options["preflight"]):
+        with profiler.stage("preflight"):
+            command = command_cursor(cnx, cursor)
+            labels = [f'entity query {members[0][0]}' for members, query in entity_units] + [
+                f'edge query {members[0][0]}' if (len(members) == 1)
+                else 'edge queries ' + ', '.join(str(i) for i, projections in members)
+                for members, query in edge_units]
+            missing_indexes = preflight_queries(command, list(zip(labels, [query for members, query in
+                entity_units + edge_units])), db_server)
+            if (options["temporary_indexes"]):
+                temporary_indexes = create_temporary_indexes(cnx, command, missing_indexes, db_server)
+                # the atexit drop is a fallback for the runs whose drop below fails, the cwd may have changed by then
+                index_db_name = str(Path(db_name).absolute()) if (db_server == 'sqlite') else db_name
+                atexit.register(drop_temporary_indexes, db_server, index_db_name, temporary_indexes, options)
+
+    # the temporary indexes are dropped once the run is done, even when it fails
+    try:
+        # the units only fetch the rows of the sampled nodes
+        sample = None
+        if (options["sample_column"] is not None):
+            with profiler.stage("sampling"):
+                entity_types, edge_types = query_node_types(entity_queries_list,
+                    edge_entity_entity_queries_list + edge_entity_feature_val_queries_list,
+                    len(edge_entity_entity_queries_list))
+                sample = sample_graph(cursor, entity_queries_list, entity_types,
+                    edge_entity_entity_queries_list + edge_entity_feature_val_queries_list, edge_types, options,
+                    db_server)
+                entity_units = [sample_unit(unit, planned_query, entity_types, sample, db_server, cursor)
+                    for unit, (members, planned_query) in zip(entity_units, planned_units[:len(entity_units)])]
+                edge_units = [sample_unit(unit, planned_query, edge_types, sample, db_server, cursor)
+                    for unit, (members, planned_query) in zip(edge_units, planned_units[len(entity_units):])]
+
+        # only the units whose key changed since the last run are executed, the others are read from the cache
+        # (or from the checkpoints of the run being resumed)
+        entity_cache_keys = None
+        edge_cache_keys = None
+        results_dir = unit_results_dir(options)
+        if (results_dir is not None):
+            with profiler.stage("cache lookup" if (options["cache_dir"] is not None) else "checkpoint lookup"):
+                tables = list()
+                for members, query in entity_units + edge_units:
+                    tables = tables + [table for table in query_tables(query) if (table not in tables)]
+                if (options["cache_dir"] is not None):
+                    Path(options["cache_dir"]).mkdir(parents=True, exist_ok=True)
+                    fingerprints = table_fingerprints(cursor, tables, options["cache_fingerprint"], db_server)
+                else:
+                    checkpoint = start_checkpoint(options["checkpoint_dir"], resume)
+                    fingerprints = {table: "run:" + checkpoint["run_id"] for table in tables}
+                deduplicated = options["batch_size"] is None or options["spill_dir"] is None
+                entity_cache_keys = [query_cache_key(unit, fingerprints, deduplicated) for unit in entity_units]
+                edge_cache_keys = [query_cache_key(unit, fingerprints, deduplicated) for unit in edge_units]
+                num_cached = sum((Path(results_dir) / Path(key + ".pkl")).exists()
+                    for key in entity_cache_keys + edge_cache_keys)
+                if (options["cache_dir"] is not None):
+                    print(f'Query cache: {num_cached} of {len(entity_units) + len(edge_units)} '
+                        'queries/scans are cached')
+                elif (resume):
+                    print(f'Resuming run {checkpoint["run_id"]}: {num_cached} of {len(entity_units) + len(edge_units)} '
+                        'queries/scans are already done')
+
+        entity_results = execute_query_units(cursor, entity_units, options, executor, entity_cache_keys,
+            profiler.entity_stats)
+        edge_results = execute_query_units(cursor, edge_units, options, executor, edge_cache_keys, profiler.edge_stats)
+        if (sample is not None):
+            entity_results = filter_sampled_results(entity_results, entity_types, sample)
+            edge_results = filter_sampled_results(edge_results, edge_types, sample)
+        entity_results = profiler.track(entity_results, len(entity_queries_list))
+        edge_results = profiler.track(edge_results,
+            len(edge_entity_entity_queries_list) + len(edge_entity_feature_val_queries_list))
+
+        # ids of the earlier runs are kept when there is an id store
+        entity_mapping = None
+        rel_mapping = None
+        if (options["id_store_dir"] is not None):
+            entity_mapping, rel_mapping = load_id_store(options["id_store_dir"])
+
+        if (options["spill_dir"] is not None):
+            # out-of-core mode, the nodes & edges are mapped one partition at a time
+            with profiler.stage("out-of-core mapping & output"):
+                external_post_processing(entity_results, edge_results, entity_queries_list,
+                    edge_entity_entity_queries_list, edge_entity_entity_rel_list, edge_entity_feature_val_queries_list,
+                    edge_entity_feature_val_rel_list, options, profiler.edge_stats)
+        else:
+            with profiler.stage("entity mapping"):
+                entity_mapping = entity_node_to_uuids(entity_results, entity_queries_list, entity_mapping)
+            with profiler.stage("edge mapping & output"):
+                src_rel_dst = post_processing(edge_results, edge_entity_entity_queries_list,
+                    edge_entity_entity_rel_list, edge_entity_feature_val_queries_list, edge_entity_feature_val_rel_list,
+                    entity_mapping, options, rel_mapping, profiler.edge_stats)  # the pd dataframe (None when streaming)
+        if (sample is not None):
+            report_relation_counts(profiler.edge_stats, edge_entity_entity_rel_list + edge_entity_feature_val_rel_list)
+        if (executor is not None):
+            executor.shutdown()
+        # a sampled run only uses the entries of its sampled queries, the ones of the full runs are kept for them
+        if (options["cache_dir"] is not None and options["sample_column"] is None):
+            prune_query_cache(options["cache_dir"], set(entity_cache_keys + edge_cache_keys))
+        if (options["checkpoint_dir"] is not None):
+            finish_checkpoint(options["checkpoint_dir"], checkpoint)
+    finally:
+        if (len(temporary_indexes) != 0):
+            # the connection of the run may still hold locks on the tables or have a result pending
+            cnx.close()
+            try:
+                drop_temporary_indexes(db_server, index_db_name, temporary_indexes, options)
+                atexit.unregister(drop_temporary_indexes)
+            except Exception as err:
+                print(f'Warning: could not drop the temporary indexes, retrying at exit: {err}')
+    # src_rel_dst already holds integer ids, node_mapping.txt & relation_mapping.txt map them back to names
 
-    # returning both cnx & cursor because cnx is main object deleting it leads to lose of cursor
-    cnx, cursor = connect_to_db(db_server, db_name)
-    entity_queries_list = validation_check_entity_queries(entity_queries_list)
-    edge_entity_entity_queries_list = validation_check_edge_entity_entity_queries(edge_entity_entity_queries_list)
-    edge_entity_feature_val_queries_list = validation_check_edge_entity_feature_val_queries(edge_entity_feature_val_queries_list)
-    entity_mapping = entity_node_to_uuids(cursor, entity_queries_list)
-    src_rel_dst = post_processing(cursor, edge_entity_entity_queries_list, edge_entity_entity_rel_list,
-        edge_entity_feature_val_queries_list, edge_entity_feature_val_rel_list, entity_mapping)  # this is the pd dataframe
-    # convert_to_int() should be next, but we are relying on the Marius' preprocessing module
+    if (options["report_path"] is not None):
+        profiler.write(options["report_path"], entity_queries_list,
+            edge_entity_entity_queries_list + edge_entity_feature_val_queries_list,
+            edge_entity_entity_rel_list + edge_entity_feature_val_rel_list,
+            {"db_server": db_server, "db_name": db_name,
+            "options": {key: value for key, value in options.items() if (key != "db_password")}})
+    profiler.stop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Converts the tables of a database to a graph for Marius, "
+        "as configured in conf/config.yaml")
+    parser.add_argument("--resume", action="store_true",
+        help="resume the last run checkpointed to the checkpoint_dir, the completed queries are not run again")
+    main(parser.parse_args().resume)
\ No newline at end of file
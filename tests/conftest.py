@@ -0,0 +1,95 @@
+import os
+import sys
+from pathlib import Path
+import pandas as pd
+import pytest
+
+REPO_DIR = Path(__file__).absolute().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+import t2g
+import benchmark
+
+@pytest.fixture(scope="session")
+def pbdb_sqlite(tmp_path_factory):
+    """
+    Small synthetic PBDB database (see benchmark.generate_pbdb) with dirty values, in a sqlite file
+    """
+    db_path = tmp_path_factory.mktemp("db") / "pbdb.sqlite"
+    benchmark.load_tables("sqlite", str(db_path), benchmark.generate_pbdb(scale=0.03, seed=1, dirty_fraction=0.2))
+    return db_path
+
+# entity to feature value relations of the runs, the conf/ file of the repo has none
+FEATURE_VALUE_QUERIES = """has_environment
+SELECT occurrences.taxon_no, collections.environment FROM occurrences, collections WHERE occurrences.collection_no = collections.collection_no;
+has_lithology
+SELECT collections.formation, collections.lithology1 FROM collections;
+"""
+
+def write_config(directory, db_path, options):
+    """
+    Writes conf/config.yaml in directory, with the conf/ queries of the repo, FEATURE_VALUE_QUERIES & the
+    given options
+    """
+    (directory / "conf").mkdir(parents=True, exist_ok=True)
+    (directory / "conf/edges_entity_feature_values.txt").write_text(FEATURE_VALUE_QUERIES)
+    lines = ["db_server: sqlite", "db_name: " + str(db_path),
+        "entity_node_queries: " + str(REPO_DIR / "conf/entity_nodes.txt"),
+        "edges_entity_entity_queries: " + str(REPO_DIR / "conf/edges_entity_entity.txt"),
+        "edges_entity_feature_values_queries: conf/edges_entity_feature_values.txt"]
+    for key, value in options.items():
+        lines.append(key + ": " + ("null" if (value is None) else str(value).lower() if isinstance(value, bool)
+            else str(value)))
+    (directory / "conf/config.yaml").write_text('\n'.join(lines) + '\n')
+
+def read_named_edges(directory, edges_file="all_edges(t2g).txt"):
+    """
+    Reads the text output of a run with the node & relation ids replaced by their names
+    :return edges: Sorted list of (src name, relation, dst name)
+    """
+    def read(name):
+        return pd.read_csv(directory / name, sep='\t', header=None, dtype=str, keep_default_na=False)
+    nodes = read("node_mapping.txt")
+    rels = read("relation_mapping.txt")
+    node_names = dict(zip(nodes[1], nodes[0]))
+    node_names[''] = None
+    rel_names = dict(zip(rels[1], rels[0]))
+    if ((directory / edges_file).stat().st_size == 0):
+        return []
+    edges = read(edges_file)
+    return sorted(zip(edges[0].map(node_names), edges[1].map(rel_names), edges[2].map(node_names)),
+        key=str)
+
+@pytest.fixture
+def run_t2g(tmp_path, monkeypatch):
+    """
+    Returns a function running t2g.main on a sqlite database with the given options, in a directory of its
+    own, and returning the directory
+    """
+    runs = [0]
+
+    def run(db_path, **options):
+        runs[0] += 1
+        directory = tmp_path / ("run" + str(runs[0]))
+        write_config(directory, db_path, options)
+        monkeypatch.chdir(directory)
+        t2g.main()
+        return directory
+    return run
+
+@pytest.fixture(scope="session")
+def default_edges(pbdb_sqlite, tmp_path_factory):
+    """
+    Edges of a run with the default options, which every optional mode must reproduce
+    """
+    directory = tmp_path_factory.mktemp("default")
+    write_config(directory, pbdb_sqlite, {})
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        t2g.main()
+    finally:
+        os.chdir(cwd)
+    edges = read_named_edges(directory)
+    assert len(edges) > 1000
+    return edges
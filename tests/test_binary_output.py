@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+from omegaconf import OmegaConf
+
+import t2g
+
+def read_mapping(path):
+    return pd.read_csv(path, sep='\t', header=None, dtype=str, keep_default_na=False)
+
+def test_partitioned_edges_are_bucketed_like_the_offsets(pbdb_sqlite, run_t2g, default_edges):
+    directory = run_t2g(pbdb_sqlite, output_format="binary", num_partitions=4)
+    nodes = read_mapping(directory / "nodes/node_mapping.txt")
+    rels = read_mapping(directory / "edges/relation_mapping.txt")
+    edges = np.fromfile(directory / "edges/train_edges.bin", dtype=np.int32).reshape(-1, 3)
+    bucket_sizes = np.loadtxt(directory / "edges/train_partition_offsets.txt", dtype=np.int64)
+    assert not (directory / "edges/train_edges.unordered").exists()
+
+    partition_size = -(-len(nodes) // 4)
+    buckets = (edges[:, 0] // partition_size) * 4 + edges[:, 2] // partition_size
+    assert len(bucket_sizes) == 16 and bucket_sizes.sum() == len(edges)
+    assert (np.diff(buckets) >= 0).all()
+    assert (np.bincount(buckets, minlength=16) == bucket_sizes).all()
+
+    node_names = dict(zip(nodes[1].astype(int), nodes[0]))
+    rel_names = dict(zip(rels[1].astype(int), rels[0]))
+    named = sorted(((node_names[src], rel_names[rel], node_names[dst]) for src, rel, dst in edges), key=str)
+    assert named == [edge for edge in default_edges if (edge[0] is not None and edge[2] is not None)]
+
+    dataset = OmegaConf.load(directory / "dataset.yaml")
+    assert dataset.num_edges == dataset.num_train == len(edges)
+    assert dataset.num_nodes == len(nodes) and dataset.num_relations == len(rels)
+    assert dataset.num_partitions == 4
+
+def test_ids_overflowing_the_id_dtype_exit(tmp_path):
+    writer = t2g.BinaryEdgeWriter(tmp_path, "int32")
+    writer.write(pd.DataFrame({"src": [0, 1], "rel": [0, 0], "dst": [1, 2]}))
+    with pytest.raises(SystemExit):
+        writer.write(pd.DataFrame({"src": [0], "rel": [0], "dst": [2 ** 31]}))
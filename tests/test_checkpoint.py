@@ -0,0 +1,31 @@
+import pytest
+
+import t2g
+from conftest import write_config, read_named_edges
+
+def test_interrupted_run_resumes_from_its_checkpoints(pbdb_sqlite, tmp_path, monkeypatch, capsys, default_edges):
+    write_config(tmp_path, pbdb_sqlite, {"checkpoint_dir": tmp_path / "checkpoints", "batch_size": 500})
+    monkeypatch.chdir(tmp_path)
+    clean_tokens = t2g.clean_tokens
+    calls = [0]
+
+    def interrupted_clean_tokens(*args, **kwargs):
+        calls[0] += 1
+        if (calls[0] == 9):
+            raise KeyboardInterrupt
+        return clean_tokens(*args, **kwargs)
+    monkeypatch.setattr(t2g, "clean_tokens", interrupted_clean_tokens)
+    with pytest.raises(KeyboardInterrupt):
+        t2g.main()
+    monkeypatch.setattr(t2g, "clean_tokens", clean_tokens)
+    assert len(list((tmp_path / "checkpoints").glob("*.tmp"))) == 1
+    capsys.readouterr()
+
+    t2g.main(resume=True)
+    out = capsys.readouterr().out
+    assert "Discarded 1 partly written query results" in out
+    assert "7 of 15 queries/scans are already done" in out
+    assert read_named_edges(tmp_path) == default_edges
+    assert list((tmp_path / "checkpoints").glob("*.tmp")) == []
+    with pytest.raises(SystemExit):
+        t2g.main(resume=True)
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import t2g
+from conftest import read_named_edges
+
+RAW_VALUES = ["Bob", " bob ", "\tBOB.", "'Bob'", '"bob"', "..", "", " ", "not reported", "Not Reported ", "None",
+    None, 0, 1, -17, 2 ** 40, 0.0, 1.5, 1e20, float("nan"), True, " Éire ", "ÉIRE", "İstanbul", "ß",
+    " x　", "a​b", "\x1c\x1dval\x1e\x1f", "\x85mixed\x85", "ǅ", "12", " 12 ", "1.0"]
+
+def check_column(values):
+    expected = [t2g.clean_token(value) for value in t2g.column_to_objects(values)]
+    for engine in ["python", "arrow"]:
+        tokens = t2g.clean_column(values, engine)
+        assert [token.encode() for token in tokens] == [token.encode() for token in expected], engine
+
+@pytest.mark.parametrize("values", [
+    RAW_VALUES,
+    [value for value in RAW_VALUES if isinstance(value, str)],
+    [value for value in RAW_VALUES if isinstance(value, str) and value.isascii()],
+    [0, 1, -17, 2 ** 40, None],
+    [0, 1, 2 ** 70, None],
+    [0.0, 1.5, 1e20, None, float("nan")],
+    [None, None],
+    [],
+])
+def test_clean_column_matches_clean_token(values):
+    check_column(pd.Series(values, dtype=object))
+
+@pytest.mark.parametrize("arrow_type, values", [
+    (pa.string(), [value for value in RAW_VALUES if isinstance(value, str)] + [None]),
+    (pa.large_string(), ["Bob ", None, "ÉIRE"]),
+    (pa.int64(), [0, 1, -17, 2 ** 40, None]),
+    (pa.int32(), [5, None]),
+    (pa.float64(), [0.0, 1.5, 1e20, None]),
+    (pa.null(), [None, None]),
+])
+def test_clean_column_matches_clean_token_on_arrow_columns(arrow_type, values):
+    check_column(pd.Series(pd.arrays.ArrowExtensionArray(pa.array(values, type=arrow_type))))
+
+def test_clean_column_random_strings():
+    rng = np.random.default_rng(0)
+    alphabet = list("aZ09 .'\"\t\n") + [" ", " ", "É", "ß", "İ", "\x85", "\x1f", "ǅ"]
+    values = [''.join(rng.choice(alphabet, rng.integers(0, 8))) for i in range(2000)]
+    check_column(pd.Series(values, dtype=object))
+
+def test_clean_tokens_parallel_matches_serial(monkeypatch):
+    monkeypatch.setattr(t2g, "PARALLEL_CLEANING_MIN_ROWS", 10)
+    result = pd.DataFrame({"a": pd.Series(RAW_VALUES * 3, dtype=object), "b": pd.Series(RAW_VALUES[::-1] * 3,
+        dtype=object)})
+    expected = result.apply(lambda column: column.map(t2g.clean_token))
+    for engine in ["python", "arrow"]:
+        pd.testing.assert_frame_equal(t2g.clean_tokens(result, engine, 2), expected, check_dtype=False)
+
+@pytest.mark.parametrize("options", [
+    {"cleaning_engine": "python"},
+    {"cleaning_workers": 2},
+])
+def test_cleaning_options_give_the_default_edges(pbdb_sqlite, run_t2g, default_edges, options):
+    assert read_named_edges(run_t2g(pbdb_sqlite, **options)) == default_edges
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+import t2g
+
+def random_batches(seed, num_batches=60, max_rows=300, num_values=5000):
+    rng = np.random.default_rng(seed)
+    return [pd.Series(["v" + str(value) for value in rng.integers(0, num_values, rng.integers(0, max_rows))],
+        dtype=object) for i in range(num_batches)]
+
+def lookup_ids(mapping, values):
+    """
+    Ids of the values in a mapping Series of build_id_mapping, the lookup GrowingIdMapping must match
+    """
+    positions = mapping.index.get_indexer(pd.Series(values, dtype=object))
+    ids = pd.array(mapping.to_numpy()[positions], dtype='Int64')
+    ids[positions < 0] = pd.NA
+    return ids
+
+def test_growing_id_mapping_matches_extend_id_mapping():
+    initial = t2g.build_id_mapping(["v1", "stored", "v7"])
+    mapping = initial
+    growing = t2g.GrowingIdMapping(initial)
+    for batch in random_batches(0):
+        mapping = t2g.extend_id_mapping(mapping, batch)
+        growing.extend(batch)
+        assert len(growing) == len(mapping)
+        queries = pd.concat([batch, pd.Series(["missing", "v1"], dtype=object)], ignore_index=True)
+        assert lookup_ids(mapping, queries).equals(growing.lookup(queries))
+    assert len(growing.runs) < 20
+    pd.testing.assert_series_equal(growing.to_series(), mapping)
+
+def test_growing_id_mapping_empty():
+    growing = t2g.GrowingIdMapping()
+    assert len(growing) == 0
+    assert growing.lookup(["a"]).isna().all()
+    pd.testing.assert_series_equal(growing.to_series(), t2g.build_id_mapping([]))
+
+def test_sorted_runs_matches_a_set():
+    rng = np.random.default_rng(1)
+    runs = t2g.SortedRuns()
+    seen = set()
+    for i in range(200):
+        keys = np.unique(rng.integers(0, 20000, rng.integers(0, 500)).astype(np.uint64))
+        is_new = runs.add(keys)
+        assert is_new.tolist() == [int(key) not in seen for key in keys]
+        seen.update(int(key) for key in keys)
+        assert len(runs) == len(seen)
+    assert len(runs.runs) < 20
+    assert all((np.diff(run.astype(np.int64)) > 0).all() for run in runs.runs)
+
+def test_drop_seen_rows_keeps_the_first_occurrence_of_every_row():
+    seen_keys = t2g.SortedRuns()
+    batches = [pd.DataFrame({0: batch.to_numpy(), 1: batch.str.len().to_numpy()}).drop_duplicates()
+        for batch in random_batches(2)]
+    kept = pd.concat([t2g.drop_seen_rows(batch, seen_keys) for batch in batches], ignore_index=True)
+    expected = pd.concat(batches, ignore_index=True).drop_duplicates(ignore_index=True)
+    pd.testing.assert_frame_equal(kept, expected)
@@ -0,0 +1,45 @@
+import json
+import pytest
+
+import t2g
+from conftest import read_named_edges
+
+def stored_edge_files(store_dir):
+    return sorted(path.name for path in store_dir.glob("edges*.bin"))
+
+def test_id_store_keeps_the_ids_and_finds_no_delta_on_a_rerun(pbdb_sqlite, run_t2g, tmp_path):
+    store_dir = tmp_path / "store"
+    first = run_t2g(pbdb_sqlite, id_store_dir=store_dir, delta_edges=True)
+    manifest = json.loads((store_dir / "manifest.json").read_text())
+    assert stored_edge_files(store_dir) == [manifest["edges_file"]]
+    assert (store_dir / manifest["edges_file"]).stat().st_size == manifest["num_edges"] * 3 * 8
+    second = run_t2g(pbdb_sqlite, id_store_dir=store_dir, delta_edges=True)
+    assert (second / "node_mapping.txt").read_text() == (first / "node_mapping.txt").read_text()
+    assert read_named_edges(second, "delta_edges(t2g).txt") == []
+    assert stored_edge_files(store_dir) == [json.loads((store_dir / "manifest.json").read_text())["edges_file"]]
+
+def test_interrupted_manifest_write_leaves_the_store_consistent(pbdb_sqlite, run_t2g, tmp_path, monkeypatch):
+    store_dir = tmp_path / "store"
+    run_t2g(pbdb_sqlite, id_store_dir=store_dir)
+    manifest = (store_dir / "manifest.json").read_text()
+
+    def crash(*args, **kwargs):
+        raise RuntimeError("crash before the manifest is written")
+    monkeypatch.setattr(t2g.json, "dump", crash)
+    with pytest.raises(RuntimeError):
+        run_t2g(pbdb_sqlite, id_store_dir=store_dir, delta_edges=True)
+    monkeypatch.undo()
+    assert (store_dir / "manifest.json").read_text() == manifest
+    assert len(stored_edge_files(store_dir)) == 2  # the edges of the interrupted run are not part of the store
+
+    directory = run_t2g(pbdb_sqlite, id_store_dir=store_dir, delta_edges=True)
+    assert read_named_edges(directory, "delta_edges(t2g).txt") == []
+    assert len(stored_edge_files(store_dir)) == 1
+
+def test_edges_file_of_the_wrong_size_is_reported(pbdb_sqlite, run_t2g, tmp_path):
+    store_dir = tmp_path / "store"
+    run_t2g(pbdb_sqlite, id_store_dir=store_dir)
+    edges_path = store_dir / json.loads((store_dir / "manifest.json").read_text())["edges_file"]
+    edges_path.write_bytes(edges_path.read_bytes()[:-24])
+    with pytest.raises(SystemExit):
+        run_t2g(pbdb_sqlite, id_store_dir=store_dir, delta_edges=True)
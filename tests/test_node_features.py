@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+import t2g
+from conftest import write_config, read_named_edges, FEATURE_VALUE_QUERIES
+
+NUMERIC_FEATURE_VALUE_QUERIES = FEATURE_VALUE_QUERIES + """has_max_interval
+SELECT collections.formation, collections.max_interval_no FROM collections;
+has_collection_no
+SELECT collections.formation, collections.collection_no FROM collections;
+"""
+
+NODE_FEATURES = {"has_environment": "multi_hot", "has_max_interval": "float32", "has_collection_no": "bucketized",
+    "has_lithology": "bucketized"}
+
+def run(directory, db_path, options, monkeypatch):
+    write_config(directory, db_path, options)
+    (directory / "conf/edges_entity_feature_values.txt").write_text(NUMERIC_FEATURE_VALUE_QUERIES)
+    monkeypatch.chdir(directory)
+    t2g.main()
+
+def read_features(directory, rel):
+    labels = pd.read_csv(directory / (rel + "_features.txt"), sep='\t', header=None, dtype=str,
+        keep_default_na=False)
+    return np.load(directory / (rel + "_features.npy")), list(labels[0])
+
+def test_feature_matrices_are_aligned_with_the_node_mapping(pbdb_sqlite, tmp_path, monkeypatch, capsys):
+    run(tmp_path / "edges", pbdb_sqlite, {}, monkeypatch)
+    values = dict()  # rel -> src name -> feature values, from the edges of the run without node_features
+    for src, rel, dst in read_named_edges(tmp_path / "edges"):
+        if (src is not None and rel in NODE_FEATURES):
+            values.setdefault(rel, dict()).setdefault(src, set()).add(dst)
+    capsys.readouterr()
+
+    directory = tmp_path / "features"
+    run(directory, pbdb_sqlite, {"node_features": NODE_FEATURES}, monkeypatch)
+    out = capsys.readouterr().out
+    assert {rel for src, rel, dst in read_named_edges(directory)} & set(NODE_FEATURES) == set()
+    nodes = pd.read_csv(directory / "node_mapping.txt", sep='\t', header=None, dtype=str, keep_default_na=False)
+    names = list(nodes[0])
+    assert list(nodes[1].astype(int)) == list(range(len(names)))
+
+    matrix, labels = read_features(directory, "has_environment")
+    assert matrix.shape == (len(names), len(labels))
+    for row, name in zip(matrix, names):
+        assert {labels[c] for c in np.flatnonzero(row)} == values["has_environment"].get(name, set())
+
+    matrix, labels = read_features(directory, "has_max_interval")
+    assert matrix.shape == (len(names), 1)
+    for value, name in zip(matrix[:, 0], names):
+        if (name in values["has_max_interval"]):
+            assert np.isclose(value, np.mean([float(v) for v in values["has_max_interval"][name]]))
+        else:
+            assert np.isnan(value)
+
+    matrix, labels = read_features(directory, "has_collection_no")
+    lower = np.array([float(label[1:-1].split(', ')[0]) for label in labels])
+    for row, name in zip(matrix, names):
+        buckets = {int(np.searchsorted(lower, float(v), side='right')) - 1
+            for v in values["has_collection_no"].get(name, set())}
+        assert set(np.flatnonzero(row)) == buckets
+
+    matrix, labels = read_features(directory, "has_lithology")
+    assert not matrix.any()
+    assert "Warning: none of the" in out and "values of has_lithology is a number" in out
@@ -0,0 +1,11 @@
+import pytest
+
+from conftest import read_named_edges
+
+@pytest.mark.parametrize("batch_size", [None, 300])
+def test_out_of_core_runs_give_the_default_edges(pbdb_sqlite, run_t2g, default_edges, tmp_path, batch_size):
+    spill_dir = tmp_path / "spill"
+    directory = run_t2g(pbdb_sqlite, spill_dir=spill_dir, spill_partitions=4, memory_budget_mb=1,
+        batch_size=batch_size)
+    assert read_named_edges(directory) == default_edges
+    assert list(spill_dir.iterdir()) == []
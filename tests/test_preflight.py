@@ -0,0 +1,43 @@
+import json
+import shutil
+import sqlite3
+import types
+import pytest
+
+import t2g
+
+def test_preflight_runs_before_the_sampling(pbdb_sqlite, run_t2g, capsys):
+    directory = run_t2g(pbdb_sqlite, preflight=True, sample_column="occurrences.taxon_no",
+        sample_fraction=0.2, report_path="report.json")
+    stages = list(json.loads((directory / "report.json").read_text())["stages"])
+    assert stages.index("preflight") < stages.index("sampling")
+    assert "Preflight:" in capsys.readouterr().out
+
+def temporary_index_names(db_path):
+    cnx = sqlite3.connect(db_path)
+    names = [row[0] for row in cnx.execute("SELECT name FROM sqlite_master WHERE type = 'index' "
+        "AND name LIKE 't2g_tmp_%';")]
+    cnx.close()
+    return names
+
+def test_temporary_indexes_are_dropped_when_the_run_ends(pbdb_sqlite, run_t2g, tmp_path, monkeypatch, capsys):
+    db_path = tmp_path / "pbdb.sqlite"
+    shutil.copy(pbdb_sqlite, db_path)
+    # the join keys of the synthetic tables are primary keys, every one of them is reported as unindexed instead
+    monkeypatch.setattr(t2g, "indexed_columns", lambda cursor, table, db_server: set())
+    exit_callbacks = list()
+    monkeypatch.setattr(t2g, "atexit", types.SimpleNamespace(register=lambda *args: exit_callbacks.append(args),
+        unregister=lambda function: exit_callbacks.clear()))
+    run_t2g(db_path, preflight=True, temporary_indexes=True)
+    assert "Created the temporary index" in capsys.readouterr().out
+    assert temporary_index_names(db_path) == []
+    assert exit_callbacks == []
+
+    def crash(*args, **kwargs):
+        raise RuntimeError("crash while the queries run")
+    monkeypatch.setattr(t2g, "execute_query_units", crash)
+    with pytest.raises(RuntimeError):
+        run_t2g(db_path, preflight=True, temporary_indexes=True)
+    assert "Dropped" in capsys.readouterr().out
+    assert temporary_index_names(db_path) == []
+    assert exit_callbacks == []
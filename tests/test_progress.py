@@ -0,0 +1,18 @@
+import io
+import re
+import sys
+
+import t2g
+
+def test_progress_line_is_ended_before_other_output(pbdb_sqlite, run_t2g, monkeypatch):
+    monkeypatch.setattr(t2g, "PROGRESS_SECONDS", 0.0)
+    output = io.StringIO()  # stdout & stderr interleaved like on a terminal
+    monkeypatch.setattr(sys, "stdout", output)
+    monkeypatch.setattr(sys, "stderr", output)
+    run_t2g(pbdb_sqlite, progress=True, batch_size=500)
+    assert sys.stdout is output
+    lines = output.getvalue().split('\n')
+    assert any(re.search(r'rows, [0-9.]+s, [0-9]+ MB', line) for line in lines)
+    for line in lines:
+        # a progress line is only followed by another progress line (after a \r) or by a newline
+        assert re.search(r'MB  [^\r]', line) is None, line
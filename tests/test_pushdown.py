@@ -0,0 +1,55 @@
+import sqlite3
+import pytest
+
+import t2g
+from conftest import read_named_edges
+
+VALUES = [0, 1, 17, -3, 2 ** 40, 0.0, 1.0, 1.5, -0.0, 1e20, 1e-7, 3.5, "0", " 0 ", "0.0", "1.0", "None", " NONE",
+    "not reported", "Not Reported.", "", " ", "Bob", " bob ", "BOB.", "'bob'", "ÉIRE", "éire", "x\t", None, b"blob"]
+
+@pytest.fixture(scope="module")
+def values_db(tmp_path_factory):
+    """
+    Database with columns of every sqlite type, including values of several types in the same column
+    """
+    db_path = tmp_path_factory.mktemp("pushdown") / "values.sqlite"
+    cnx = sqlite3.connect(db_path)
+    cnx.execute("CREATE TABLE t (k INTEGER, mixed, real_value REAL, text_value TEXT)")
+    rows = [(k, VALUES[k], float(k) / 2, str(VALUES[k])) for k in range(len(VALUES))]
+    rows += [(k + len(VALUES), VALUES[-k - 1], 1e20 * k, None) for k in range(len(VALUES))]
+    cnx.executemany("INSERT INTO t VALUES (?, ?, ?, ?)", rows)
+    cnx.commit()
+    cnx.close()
+    return str(db_path)
+
+def run_unit(db_path, query, pushdown):
+    unit = ([(0, None)], query)
+    if (pushdown):
+        unit = t2g.pushdown_cleaning_unit(unit, "sqlite")
+    cnx, cursor = t2g.connect_to_db("sqlite", db_path)
+    results = [result for i, result in t2g.run_query_unit(cursor, unit)]
+    cnx.close()
+    return sorted(tuple(row) for result in results for row in result.itertuples(index=False))
+
+@pytest.mark.parametrize("query", [
+    "SELECT t.k, t.mixed FROM t;",
+    "SELECT t.mixed, t.real_value FROM t;",
+    "SELECT t.text_value, t.real_value FROM t WHERE t.k > 3;",
+    "SELECT t.mixed, t.k FROM t UNION SELECT t.text_value, t.k FROM t;",
+])
+def test_pushdown_cleaning_gives_the_client_side_rows(values_db, query):
+    rows = run_unit(values_db, query, False)
+    assert len(rows) != 0
+    assert run_unit(values_db, query, True) == rows
+
+def test_pushdown_leaves_columns_of_unknown_type_raw():
+    query = t2g.pushdown_cleaning("SELECT a.x, a.y FROM a;", "mysql")
+    assert query == "SELECT DISTINCT a.x, a.y FROM a WHERE a.x IS NOT NULL AND a.y IS NOT NULL;"
+
+@pytest.mark.parametrize("options", [
+    {"pushdown_cleaning": True},
+    {"pushdown_cleaning": True, "batch_size": 500},
+    {"pushdown_cleaning": True, "shared_scans": False},
+])
+def test_pushdown_runs_give_the_default_edges(pbdb_sqlite, run_t2g, default_edges, options):
+    assert read_named_edges(run_t2g(pbdb_sqlite, **options)) == default_edges
@@ -0,0 +1,28 @@
+import t2g
+from conftest import write_config, read_named_edges, FEATURE_VALUE_QUERIES
+
+SUBQUERY_FEATURE_VALUE_QUERIES = FEATURE_VALUE_QUERIES + """has_lithology2
+SELECT c.formation, c.lithology2 FROM (SELECT collections.formation, collections.lithology2 FROM collections WHERE collections.collection_no > 0) c;
+"""
+
+def test_query_tables_finds_the_tables_of_sub_queries():
+    query = ("SELECT s.a, s.b FROM (SELECT x AS a, y AS b FROM t1, t2 WHERE t1.k = t2.k) s, t3 "
+        "WHERE s.a = t3.a AND s.b IN (SELECT c FROM t4);")
+    assert t2g.query_tables(query) == ["t3", "t1", "t2", "t4"]
+    assert t2g.query_tables("SELECT a, b FROM t1 JOIN t2 ON (t1.a = t2.a);") == ["t1", "t2"]
+
+def test_cached_run_with_a_sub_query_gives_the_same_edges(pbdb_sqlite, tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    (cache_dir / "interrupted.tmp").write_bytes(b"partly written")
+    runs = list()
+    for run in range(2):
+        directory = tmp_path / ("run" + str(run))
+        write_config(directory, pbdb_sqlite, {"cache_dir": cache_dir})
+        (directory / "conf/edges_entity_feature_values.txt").write_text(SUBQUERY_FEATURE_VALUE_QUERIES)
+        monkeypatch.chdir(directory)
+        t2g.main()
+        runs.append(read_named_edges(directory))
+    assert runs[0] == runs[1]
+    assert any(edge[1] == "has_lithology2" for edge in runs[0])
+    assert list(cache_dir.glob("*.tmp")) == []
@@ -0,0 +1,70 @@
+import threading
+import time
+import pytest
+
+import t2g
+from conftest import read_named_edges
+
+def fake_units(first, num_units):
+    return [([(first + u, None)], "SELECT " + str(first + u)) for u in range(num_units)]
+
+@pytest.fixture
+def counted_run_query_unit(monkeypatch):
+    """
+    Replaces run_query_unit by units of 20 small batches, counting the batches produced
+    """
+    produced = [0]
+    lock = threading.Lock()
+
+    def run_query_unit(cursor, unit, options=t2g.DEFAULT_OPTIONS, cache_key=None, stats=None):
+        (i, projections), = unit[0]
+        stats[i] = t2g.new_query_stats()
+        for b in range(20):
+            if (unit[1] == "SELECT 5" and b == 3):
+                raise ValueError("query failed")
+            with lock:
+                produced[0] += 1
+            stats[i]["rows"] += 1
+            yield i, b
+    monkeypatch.setattr(t2g, "run_query_unit", run_query_unit)
+    monkeypatch.setattr(t2g, "init_query_worker", lambda *args: setattr(t2g.worker_state, "cursor", None))
+    return produced
+
+def consume(results, produced, bound, pairs):
+    for pair in results:
+        time.sleep(0.001)
+        pairs.append(pair)
+        assert produced[0] - len(pairs) <= bound
+
+def test_workers_stream_a_bounded_number_of_batches(counted_run_query_unit, tmp_path):
+    num_workers = 3
+    options = dict(t2g.DEFAULT_OPTIONS, num_workers=num_workers)
+    executor = t2g.create_query_executor("sqlite", str(tmp_path), num_workers, "threads", options)
+    entity_stats = dict()
+    edge_stats = dict()
+    entity_results = t2g.execute_query_units(None, fake_units(0, 4), options, executor, None, entity_stats)
+    edge_results = t2g.execute_query_units(None, fake_units(10, 6), options, executor, None, edge_stats)
+    pairs = list()
+    # a running unit is at most UNIT_QUEUE_BATCHES batches ahead, plus the one its worker is putting, & the
+    # batch taken from its queue is only counted as consumed once the generator has returned it
+    bound = num_workers * (t2g.UNIT_QUEUE_BATCHES + 1) + 1
+    consume(entity_results, counted_run_query_unit, bound, pairs)
+    consume(edge_results, counted_run_query_unit, bound, pairs)
+    executor.shutdown()
+    assert pairs == [(i, b) for i in list(range(4)) + list(range(10, 16)) for b in range(20)]
+    assert all(stats[i]["rows"] == 20 for stats in [entity_stats, edge_stats] for i in stats)
+
+def test_worker_errors_reach_the_main_thread(counted_run_query_unit, tmp_path):
+    options = dict(t2g.DEFAULT_OPTIONS, num_workers=2)
+    executor = t2g.create_query_executor("sqlite", str(tmp_path), 2, "threads", options)
+    with pytest.raises(ValueError, match="query failed"):
+        list(t2g.execute_query_units(None, fake_units(0, 8), options, executor))
+    executor.shutdown()
+
+@pytest.mark.parametrize("options", [
+    {"num_workers": 3},
+    {"num_workers": 3, "batch_size": 500},
+    {"num_workers": 3, "worker_type": "processes", "batch_size": 700},
+])
+def test_parallel_runs_give_the_default_edges(pbdb_sqlite, run_t2g, default_edges, options):
+    assert read_named_edges(run_t2g(pbdb_sqlite, **options)) == default_edges
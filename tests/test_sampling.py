@@ -0,0 +1,54 @@
+import sqlite3
+import numpy as np
+import pytest
+
+import t2g
+
+VALUES = ["ÉIRE", "éire", "Éire ", "İstanbul", "i̇stanbul", "ΣΑΣ", "σας", "Bob", " bob.", "bob", 1e20, 3.5, 1.0, 2,
+    "2", " 2 ", "\tx", "x\x1c", "ǅ", "ǆ", None]
+
+@pytest.fixture(scope="module")
+def sample_db(tmp_path_factory):
+    db_path = tmp_path_factory.mktemp("sample") / "values.sqlite"
+    cnx = sqlite3.connect(db_path)
+    cnx.execute("CREATE TABLE t (k INTEGER, mixed)")
+    cnx.executemany("INSERT INTO t VALUES (?, ?)", list(enumerate(VALUES)))
+    cnx.commit()
+    cnx.close()
+    return str(db_path)
+
+def sampled_rows(db_path, tokens, pushdown):
+    query = "SELECT t.k, t.mixed FROM t;"
+    query_types = [[None, "t_mixed_"]]
+    sample = {"t_mixed_": np.array(tokens, dtype=object)}
+    unit = ([(0, None)], query)
+    cnx, cursor = t2g.connect_to_db("sqlite", db_path)
+    if (pushdown):
+        unit = t2g.sample_unit(unit, query, query_types, sample, "sqlite", cursor)
+    results = t2g.filter_sampled_results(t2g.run_query_unit(cursor, unit), query_types, sample)
+    rows = sorted(tuple(row) for i, result in results for row in result.itertuples(index=False))
+    cnx.close()
+    return rows
+
+@pytest.mark.parametrize("tokens", [
+    ["éire", "i̇stanbul", "σας", "ǆ"],
+    ["1e+20", "3.5", "1.0", "2"],
+    ["bob", "x"],
+    [t2g.clean_token(value) for value in VALUES],
+])
+def test_sample_predicate_keeps_every_row_of_the_sampled_tokens(sample_db, tokens):
+    rows = sampled_rows(sample_db, tokens, False)
+    assert len(rows) != 0
+    assert sampled_rows(sample_db, tokens, True) == rows
+
+def test_sampled_run_keeps_the_cache_of_the_full_run(pbdb_sqlite, run_t2g, tmp_path):
+    cache_dir = tmp_path / "cache"
+    run_t2g(pbdb_sqlite, cache_dir=cache_dir)
+    full_entries = set(cache_dir.glob("*.pkl"))
+    run_t2g(pbdb_sqlite, cache_dir=cache_dir, sample_column="occurrences.taxon_no", sample_fraction=0.2)
+    assert full_entries <= set(cache_dir.glob("*.pkl"))
+
+def test_sampled_run_rejects_the_id_store(pbdb_sqlite, run_t2g, tmp_path):
+    with pytest.raises(SystemExit):
+        run_t2g(pbdb_sqlite, sample_column="occurrences.taxon_no", id_store_dir=tmp_path / "store")
+    assert not (tmp_path / "store").exists()
@@ -0,0 +1,19 @@
+import pytest
+
+import t2g
+from conftest import read_named_edges
+
+def test_queries_with_the_same_from_where_share_a_scan():
+    queries = ["SELECT a.x, a.y FROM a WHERE a.z = 1;", "SELECT a.y, a.w FROM a WHERE  a.z = 1;",
+        "SELECT a.x, b.y FROM a, b WHERE a.k = b.k;", "SELECT a.w, a.x FROM a WHERE a.z = 1 UNION "
+        "SELECT a.y, a.x FROM a WHERE a.z = 1;"]
+    units = t2g.plan_shared_scans(queries)
+    assert units == [([(0, [(0, 1)]), (1, [(1, 2)]), (3, [(2, 0), (1, 0)])],
+        "SELECT a.x, a.y, a.w FROM a WHERE a.z = 1;"), ([(2, None)], queries[2])]
+
+@pytest.mark.parametrize("options", [
+    {"shared_scans": False},
+    {"shared_scans": False, "batch_size": 500},
+])
+def test_separate_scans_give_the_default_edges(pbdb_sqlite, run_t2g, default_edges, options):
+    assert read_named_edges(run_t2g(pbdb_sqlite, **options)) == default_edges
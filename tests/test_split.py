@@ -0,0 +1,15 @@
+import pytest
+
+import t2g
+from conftest import read_named_edges
+
+@pytest.mark.parametrize("stratified", [False, True])
+def test_splits_hold_the_default_edges_whatever_the_batch_size(pbdb_sqlite, run_t2g, default_edges, stratified):
+    splits = list()
+    for batch_size in [None, 300, 2000]:
+        directory = run_t2g(pbdb_sqlite, split_fractions=[0.8, 0.1, 0.1], split_stratified=stratified,
+            shuffle_buffer_edges=1000, batch_size=batch_size)
+        splits.append([read_named_edges(directory, name + "_edges(t2g).txt") for name in t2g.SPLIT_NAMES])
+        assert sorted(sum(splits[-1], []), key=str) == default_edges
+    assert splits[1] == splits[0] and splits[2] == splits[0]
+    assert all(len(edges) != 0 for edges in splits[0])
@@ -0,0 +1,46 @@
+import sqlite3
+import pytest
+
+import t2g
+from conftest import read_named_edges
+
+@pytest.fixture
+def mixed_types_db(tmp_path):
+    """
+    Database with a column whose values change type after the first rows, which the ADBC driver can't read
+    """
+    db_path = tmp_path / "mixed.sqlite"
+    cnx = sqlite3.connect(db_path)
+    cnx.execute("CREATE TABLE t (a)")
+    cnx.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(5000)] + [(3.5,), ("x",)])
+    cnx.commit()
+    cnx.close()
+    return str(db_path)
+
+def fetch_values(db_path, driver, batch_size):
+    options = dict(t2g.DEFAULT_OPTIONS, sqlite_driver=driver)
+    cnx, cursor = t2g.connect_to_db("sqlite", db_path, None, options)
+    batches = list(t2g.fetch_query_batches(cursor, "SELECT a FROM t", batch_size))
+    cnx.close()
+    return [token for batch in batches for token in t2g.clean_column(batch.iloc[:, 0])]
+
+def test_sqlite3_is_the_default_driver(mixed_types_db):
+    cnx, cursor = t2g.connect_to_db("sqlite", mixed_types_db)
+    assert isinstance(cnx, sqlite3.Connection)
+    cnx.close()
+
+@pytest.mark.parametrize("batch_size", [None, 1000])
+def test_sqlite3_reads_mixed_type_columns(mixed_types_db, batch_size):
+    assert fetch_values(mixed_types_db, "sqlite3", batch_size) == [str(i) for i in range(5000)] + ["3.5", "x"]
+
+@pytest.mark.parametrize("batch_size", [None, 1000])
+def test_adbc_fails_clearly_on_mixed_type_columns(mixed_types_db, batch_size, capsys):
+    pytest.importorskip("adbc_driver_sqlite")
+    with pytest.raises(SystemExit):
+        fetch_values(mixed_types_db, "adbc", batch_size)
+    assert "sqlite_driver: sqlite3" in capsys.readouterr().out
+
+def test_adbc_driver_gives_the_sqlite3_edges(pbdb_sqlite, run_t2g, default_edges):
+    pytest.importorskip("adbc_driver_sqlite")
+    assert read_named_edges(run_t2g(pbdb_sqlite, sqlite_driver="adbc")) == default_edges
+    assert read_named_edges(run_t2g(pbdb_sqlite, sqlite_driver="adbc", batch_size=500)) == default_edges
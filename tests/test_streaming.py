@@ -0,0 +1,7 @@
+import pytest
+
+from conftest import read_named_edges
+
+@pytest.mark.parametrize("batch_size", [37, 500, 7000])
+def test_batched_fetching_gives_the_default_edges(pbdb_sqlite, run_t2g, default_edges, batch_size):
+    assert read_named_edges(run_t2g(pbdb_sqlite, batch_size=batch_size)) == default_edges